@@ -0,0 +1,67 @@
+"""Compare the grid detectors on the pages of real registers.
+
+Usage (from the project folder):
+
+    python -m benchmarks.grid_detectors path/to/folder_or.pdf --detect-dpi 100
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+import red_pdf
+
+
+def max_deviation(grid_a, grid_b) -> int | None:
+    """Largest coordinate difference between cells at the same (row, col)."""
+    if grid_a.cells.shape != grid_b.cells.shape:
+        return None
+    return int(np.abs(grid_a.cells - grid_b.cells).max(initial=0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--detect-dpi", type=int)
+    args = parser.parse_args()
+
+    pdfs = sorted(args.path.glob("*.pdf")) if args.path.is_dir() else [args.path]
+    detectors = list(red_pdf.GRID_DETECTORS)
+    totals = dict.fromkeys(detectors, 0.0)
+    header = " ".join(f"{name + ' ms':>14} {'grid':>7}" for name in detectors)
+    print(f"{'page':30} {header} {'max dev px':>10}")
+
+    for pdf in pdfs:
+        images = red_pdf.iter_pdf_images(pdf, dpi=red_pdf.RENDER_DPI)
+        for pagenum, image in enumerate(images):
+            image = red_pdf.prepare_page(image)
+            columns = []
+            grids = {}
+            for name in detectors:
+                start = time.perf_counter()
+                grid = red_pdf.scan_grid(
+                    image, red_pdf.RENDER_DPI, args.detect_dpi, detector=name
+                )
+                elapsed = time.perf_counter() - start
+                totals[name] += elapsed
+                grids[name] = grid
+                shape = "-"
+                if grid is not None:
+                    shape = f"{grid[1].n_rows}x{red_pdf.N_COLUMNS}"
+                columns.append(f"{elapsed * 1000:14.1f} {shape:>7}")
+
+            deviation = None
+            if all(grid is not None for grid in grids.values()):
+                deviation = max_deviation(*(grid[1] for grid in grids.values()))
+            deviation_text = "-" if deviation is None else str(deviation)
+            label = f"{pdf.name}:{pagenum}"
+            print(f"{label:30} {' '.join(columns)} {deviation_text:>10}")
+
+    summary = " ".join(f"{totals[name] * 1000:14.1f} {'':>7}" for name in detectors)
+    print(f"{'total':30} {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Per-cell OCR latency of each OCR backend on real register pages.
+
+Usage (from the project folder):
+
+    python -m benchmarks.ocr_latency path/to/register.pdf --pages 2
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+import red_pdf
+from ocr import OCR_BACKENDS, get_ocr_backend
+
+
+def collect_text_cells(pdf: Path, n_pages: int) -> list[np.ndarray]:
+    crops = []
+    for page in red_pdf.iter_pages(pdf):
+        if page.pagenum >= n_pages:
+            break
+        for box in red_pdf.text_cells(page.grid, page.dpi).values():
+            crops.append(page.image[box.y : box.y + box.h, box.x : box.x + box.w])
+    return crops
+
+
+def time_backend(name: str, crops: list[np.ndarray]) -> tuple[float, list[float]]:
+    backend = get_ocr_backend(name, lang=red_pdf.OCR_LANG)
+    # Warm up so engine creation is reported separately from steady state.
+    start = time.perf_counter()
+    backend.image_to_string(crops[0])
+    first = time.perf_counter() - start
+
+    latencies = []
+    for crop in crops:
+        start = time.perf_counter()
+        backend.image_to_string(crop)
+        latencies.append(time.perf_counter() - start)
+    return first, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", type=Path)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument(
+        "--backends", nargs="+", choices=OCR_BACKENDS, default=list(OCR_BACKENDS)
+    )
+    args = parser.parse_args()
+
+    crops = collect_text_cells(args.pdf, args.pages)
+    print(f"{len(crops)} text cells from {args.pages} page(s) of {args.pdf.name}")
+
+    print(
+        f"{'backend':12} {'first ms':>10} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}"
+    )
+    for name in args.backends:
+        first, latencies = time_backend(name, crops)
+        latencies.sort()
+        mean = statistics.fmean(latencies) * 1000
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000
+        print(
+            f"{name:12} {first * 1000:10.1f} {mean:10.1f} {p50:10.1f} {p95:10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
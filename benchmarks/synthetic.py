@@ -0,0 +1,242 @@
+"""Generate synthetic register PDFs with known contents.
+
+Pages are drawn at RENDER_DPI with the 16-column grid at COL_AVG_XS and
+COL_AVG_WIDTHS, Cyrillic names and addresses, valid EGNs and scribbled
+signature ink. The contents of every row are saved to truth.json next to
+the PDFs.
+
+Usage (from the project folder):
+
+    python -m benchmarks.synthetic out_folder --pdfs 2 --pages 10 --seed 0
+"""
+
+import argparse
+import json
+import logging
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import red_pdf
+
+logger = logging.getLogger(__name__)
+
+TRUTH_FILE = "truth.json"
+# Fonts with Cyrillic glyphs, looked up in the system font folders.
+FONT_CANDIDATES = ("arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf")
+FONT_SIZE = 34
+
+# Landscape page at RENDER_DPI, as processed after the rotation.
+PAGE_W, PAGE_H = 3508, 2480
+ROW_H = 90
+TABLE_TOP = 250
+TABLE_MARGIN = 40
+FIRST_PAGE_ROWS = 5
+LINE_THICKNESS = 3
+# Pages are shifted by up to this many pixels, like sheets on a scanner.
+MAX_JITTER = 8
+
+FIRST_NAMES = ("Иван", "Георги", "Мария", "Елена", "Петър", "Стоян", "Йорданка")
+MIDDLE_NAMES = ("Петров", "Иванова", "Димитров", "Николаева", "Стефанов")
+LAST_NAMES = ("Георгиев", "Попова", "Христов", "Тодорова", "Колев", "Ангелова")
+TOWNS = ("гр. София", "гр. Пловдив", "гр. Варна", "с. Бояново", "гр. Русе")
+STREETS = ("ул. Витоша", "бул. Христо Ботев", "ул. Шипка", "ул. Раковски")
+
+
+@dataclass
+class TruthRow:
+    number: int | None = None
+    name: str = ""
+    address: str = ""
+    egn: int | None = None
+    # Whether the cell has ink.
+    date: bool = False
+    signature: bool = False
+    note: bool = False
+
+
+def random_egn(rng: random.Random) -> str:
+    born = date(1930, 1, 1) + timedelta(days=rng.randrange(365 * 75))
+    month = born.month + (40 if born.year >= 2000 else 0)
+    digits = f"{born.year % 100:02d}{month:02d}{born.day:02d}{rng.randrange(1000):03d}"
+    checksum = sum(int(d) * w for d, w in zip(digits, red_pdf.EGN_WEIGHTS)) % 11 % 10
+    return digits + str(checksum)
+
+
+def random_row(rng: random.Random, number: int) -> tuple[TruthRow, str]:
+    """A filled row and its EGN as written, with any leading zero."""
+    egn = random_egn(rng)
+    row = TruthRow(
+        number=number,
+        name=" ".join(
+            (rng.choice(FIRST_NAMES), rng.choice(MIDDLE_NAMES), rng.choice(LAST_NAMES))
+        ),
+        address=f"{rng.choice(TOWNS)}, {rng.choice(STREETS)} {rng.randint(1, 120)}",
+        egn=int(egn),
+        date=rng.random() < 0.7,
+        signature=rng.random() < 0.85,
+        note=rng.random() < 0.1,
+    )
+    return row, egn
+
+
+def scribble(rng: random.Random, canvas: np.ndarray, x: int, y: int, w: int, h: int):
+    """Draw a handwriting-like stroke inside the cell box."""
+    n_points = rng.randint(5, 9)
+    xs = np.linspace(x + w * 0.15, x + w * 0.85, n_points)
+    ys = [rng.uniform(y + h * 0.3, y + h * 0.7) for _ in range(n_points)]
+    points = np.array(list(zip(xs, ys)), np.int32)
+    cv2.polylines(canvas, [points], False, 0, rng.randint(3, 5), cv2.LINE_AA)
+
+
+def load_font(path: str | None = None) -> ImageFont.FreeTypeFont:
+    for name in (path,) if path else FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, FONT_SIZE)
+        except OSError:
+            continue
+    if path:
+        raise FileNotFoundError(f"Font {path} not found")
+    logger.warning("No font with Cyrillic glyphs found, names will not be readable")
+    return ImageFont.load_default(size=FONT_SIZE)
+
+
+def draw_page(
+    rng: random.Random,
+    font: ImageFont.FreeTypeFont,
+    rows: list[TruthRow],
+    egns: list[str],
+    n_rows: int,
+    first_page: bool,
+) -> Image.Image:
+    """Portrait page image, as a scanner would store the register sheet."""
+    canvas = np.full((PAGE_H, PAGE_W), 255, np.uint8)
+    dx, dy = rng.randint(-MAX_JITTER, MAX_JITTER), rng.randint(-MAX_JITTER, MAX_JITTER)
+    # Only the bottom of the first page holds the table, see
+    # `red_pdf.first_page_region`.
+    top = PAGE_H - TABLE_MARGIN - n_rows * ROW_H if first_page else TABLE_TOP
+    top += dy
+    x0 = red_pdf.COL_AVG_XS[0] + dx
+    x1 = red_pdf.COL_AVG_XS[-1] + red_pdf.COL_AVG_WIDTHS[-1] + dx
+    for n in range(n_rows + 1):
+        y = top + n * ROW_H
+        cv2.line(canvas, (x0, y), (x1, y), 0, LINE_THICKNESS)
+    for x in (*red_pdf.COL_AVG_XS, x1 - dx):
+        bottom = top + n_rows * ROW_H
+        cv2.line(canvas, (x + dx, top), (x + dx, bottom), 0, LINE_THICKNESS)
+
+    ink_columns = {
+        "date": red_pdf.COLUMN_DATE,
+        "signature": red_pdf.COLUMN_SIGNATURE,
+        "note": red_pdf.COLUMN_NOTE,
+    }
+    for n, (row, egn) in enumerate(zip(rows, egns)):
+        y = top + n * ROW_H
+        for field, col_ndx in ink_columns.items():
+            if getattr(row, field):
+                x = red_pdf.COL_AVG_XS[col_ndx] + dx
+                scribble(rng, canvas, x, y, red_pdf.COL_AVG_WIDTHS[col_ndx], ROW_H)
+
+    image = Image.fromarray(canvas)
+    draw = ImageDraw.Draw(image)
+    for n, (row, egn) in enumerate(zip(rows, egns)):
+        y = top + n * ROW_H + ROW_H // 2
+        texts = {
+            red_pdf.COLUMN_RECORD_NUM: str(row.number or ""),
+            red_pdf.COLUMN_NAME: row.name,
+            red_pdf.COLUMN_ADDRESS: row.address,
+            red_pdf.COLUMN_EGN: egn,
+        }
+        for col_ndx, text in texts.items():
+            x = red_pdf.COL_AVG_XS[col_ndx] + dx + 14
+            draw.text((x, y), text, fill=0, font=font, anchor="lm")
+    # The rendered page is turned back by `red_pdf.prepare_page`.
+    return image.transpose(Image.Transpose.ROTATE_270)
+
+
+def generate(
+    folder: Path,
+    n_pdfs: int = 2,
+    n_pages: int = 10,
+    seed: int = 0,
+    font_path: str | None = None,
+) -> dict[str, dict[int, list[TruthRow]]]:
+    """Write `n_pdfs` registers of `n_pages` pages and their truth.json.
+
+    The last page of every register is only partly filled. Pages are
+    appended to the PDFs one at a time, so memory does not grow with
+    `n_pages`.
+    """
+    rng = random.Random(seed)
+    font = load_font(font_path)
+    folder.mkdir(parents=True, exist_ok=True)
+    full_rows = (PAGE_H - TABLE_TOP - TABLE_MARGIN - MAX_JITTER) // ROW_H
+    truth: dict[str, dict[int, list[TruthRow]]] = {}
+    for pdf_ndx in range(n_pdfs):
+        name = f"register_{pdf_ndx + 1:03d}.pdf"
+        path = folder / name
+        truth[name] = {}
+        number = 1
+        for pagenum in range(n_pages):
+            n_rows = FIRST_PAGE_ROWS if pagenum == 0 else full_rows
+            n_filled = n_rows
+            if pagenum == n_pages - 1 and n_pages > 1:
+                n_filled = rng.randint(1, n_rows - 1)
+            rows, egns = [], []
+            for _ in range(n_filled):
+                row, egn = random_row(rng, number)
+                rows.append(row)
+                egns.append(egn)
+                number += 1
+            blank = n_rows - n_filled
+            rows.extend(TruthRow() for _ in range(blank))
+            egns.extend("" for _ in range(blank))
+
+            image = draw_page(rng, font, rows, egns, n_rows, pagenum == 0)
+            image.save(
+                path, "PDF", resolution=red_pdf.RENDER_DPI, append=pagenum > 0
+            )
+            truth[name][pagenum] = rows
+
+    with open(folder / TRUTH_FILE, "w", encoding="utf-8") as f:
+        data = {
+            pdf: {page: [asdict(row) for row in rows] for page, rows in pages.items()}
+            for pdf, pages in truth.items()
+        }
+        json.dump(data, f, ensure_ascii=False)
+    return truth
+
+
+def load_truth(folder: Path) -> dict[str, dict[int, list[TruthRow]]]:
+    with open(folder / TRUTH_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        pdf: {
+            int(page): [TruthRow(**row) for row in rows]
+            for page, rows in pages.items()
+        }
+        for pdf, pages in data.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--pdfs", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font", help="TrueType font with Cyrillic glyphs")
+    args = parser.parse_args()
+
+    truth = generate(args.folder, args.pdfs, args.pages, args.seed, args.font)
+    n_rows = sum(len(rows) for pages in truth.values() for rows in pages.values())
+    print(f"{len(truth)} PDFs, {n_rows} rows written to {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""End to end throughput and accuracy on synthetic registers.
+
+Generates registers with `benchmarks.synthetic` (or reuses a folder made
+by it), runs `red_pdf.main` over them with a profiler and reports pages/s,
+peak RSS, the time of every stage and the share of fields read correctly.
+Save the results of two commits and compare them:
+
+    python -m benchmarks.throughput --pdfs 2 --pages 10 -o before.json
+    python -m benchmarks.throughput --pdfs 2 --pages 10 --baseline before.json
+
+Run one configuration per process, peak RSS covers the whole process.
+"""
+
+import argparse
+import csv
+import ctypes
+import json
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import red_pdf
+from benchmarks.synthetic import TRUTH_FILE, TruthRow, generate, load_truth
+from profiling import Profiler
+
+TEXT_FIELDS = ("number", "name", "address", "egn")
+INK_FIELDS = ("date", "signature", "note")
+
+
+def peak_rss_mb() -> dict[str, float | None]:
+    """Peak resident memory of this process and of its largest child."""
+    try:
+        import resource
+    except ImportError:
+        return {"self": windows_peak_rss_mb(), "children": None}
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"self": own * unit / 2**20, "children": children * unit / 2**20}
+
+
+def windows_peak_rss_mb() -> float | None:
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", ctypes.c_ulong),
+            ("PageFaultCount", ctypes.c_ulong),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    try:
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()  # type: ignore
+        ctypes.windll.psapi.GetProcessMemoryInfo(  # type: ignore
+            process, ctypes.byref(counters), counters.cb
+        )
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize / 2**20
+
+
+def git_commit() -> str | None:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        )
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+def field_matches(field: str, value: str, truth: TruthRow) -> bool:
+    expected = getattr(truth, field)
+    if field in INK_FIELDS:
+        return (float(value) > 0 if value else False) == expected
+    if field in ("number", "egn"):
+        return (int(value) if value else None) == expected
+    return " ".join(value.split()) == expected
+
+
+def field_accuracy(
+    report: Path, truth: dict[str, dict[int, list[TruthRow]]]
+) -> dict[str, float]:
+    """Share of the truth fields found in the report, per field and overall.
+
+    Rows are matched by PDF, page and their order on the page. Rows missing
+    from the report count as wrong.
+    """
+    found: dict[tuple[str, int], list[dict[str, str]]] = {}
+    with open(report, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            found.setdefault((row["pdf"], int(row["page"])), []).append(row)
+
+    fields = (*TEXT_FIELDS, *INK_FIELDS)
+    correct = dict.fromkeys(fields, 0)
+    total = 0
+    for pdf, pages in truth.items():
+        for pagenum, rows in pages.items():
+            page_rows = found.get((pdf, pagenum), [])
+            for n, expected in enumerate(rows):
+                total += 1
+                if n >= len(page_rows):
+                    continue
+                found_row = page_rows[n]
+                for field in fields:
+                    correct[field] += field_matches(field, found_row[field], expected)
+
+    accuracy = {field: correct[field] / total if total else 0.0 for field in fields}
+    accuracy["overall"] = (
+        sum(correct.values()) / (total * len(fields)) if total else 0.0
+    )
+    return accuracy
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any]):
+    def change(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "-"
+
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'}:")
+    print(
+        f"  pages/s {baseline['pages_per_s']:.2f} -> {result['pages_per_s']:.2f} "
+        f"({change(result['pages_per_s'], baseline['pages_per_s'])})"
+    )
+    for field, value in result["accuracy"].items():
+        old = baseline["accuracy"].get(field)
+        if old is not None and abs(value - old) > 1e-9:
+            print(f"  {field} accuracy {old:.3f} -> {value:.3f}")
+    for name, stats in result["stages"].items():
+        old = baseline["stages"].get(name)
+        if old is not None:
+            print(
+                f"  {name:14} p50 {old['p50_ms']:8.1f} -> {stats['p50_ms']:8.1f} ms "
+                f"({change(stats['p50_ms'], old['p50_ms'])})"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--data",
+        type=Path,
+        help="folder of synthetic registers, generated first if it has none",
+    )
+    parser.add_argument("--pdfs", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font", help="TrueType font with Cyrillic glyphs")
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    parser.add_argument("--ocr-mode", choices=red_pdf.OCR_MODES, default="cell")
+    parser.add_argument(
+        "--ocr-backend", choices=red_pdf.OCR_BACKENDS, default="pytesseract"
+    )
+    parser.add_argument("--ocr-threads", type=int, default=1)
+    parser.add_argument(
+        "--digit-reader", choices=red_pdf.DIGIT_READERS, default="tesseract"
+    )
+    parser.add_argument("--first-pass-dpi", type=int)
+    parser.add_argument("--detect-dpi", type=int)
+    parser.add_argument("--grid-template", action="store_true")
+    parser.add_argument(
+        "--grid-detector", choices=list(red_pdf.GRID_DETECTORS), default="morphology"
+    )
+    parser.add_argument("--pipeline", nargs=3, type=int, metavar=("R", "D", "O"))
+    parser.add_argument("-o", "--output", type=Path, help="save the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="results JSON to compare with")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = args.data or Path(tmp)
+        if not (data / TRUTH_FILE).exists():
+            generate(data, args.pdfs, args.pages, args.seed, args.font)
+        truth = load_truth(data)
+        n_pages = sum(len(pages) for pages in truth.values())
+        print(f"{len(truth)} PDFs, {n_pages} pages in {data}")
+
+        options = red_pdf.ProcessOptions(
+            ocr_mode=args.ocr_mode,
+            ocr_backend=args.ocr_backend,
+            ocr_threads=args.ocr_threads,
+            digit_reader=args.digit_reader,
+            first_pass_dpi=args.first_pass_dpi,
+            detect_dpi=args.detect_dpi,
+            grid_template=args.grid_template,
+            grid_detector=args.grid_detector,
+        )
+        pipeline = red_pdf.PipelineConfig(*args.pipeline) if args.pipeline else None
+        profiler = Profiler()
+        report = Path(
+            red_pdf.main(
+                data,
+                workers=args.workers,
+                options=options,
+                pipeline=pipeline,
+                profiler=profiler,
+            )
+        )
+        accuracy = field_accuracy(report, truth)
+        report.unlink()
+
+    profile = profiler.to_dict()
+    result = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline")
+        },
+        "pages": n_pages,
+        "wall_s": profile["wall_s"],
+        "pages_per_s": profile["pages_per_s"],
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": profile["stages"],
+        "counts": profile["counts"],
+        "accuracy": accuracy,
+    }
+
+    print(profiler.summary_table())
+    rss = result["peak_rss_mb"]
+    children = "-" if rss["children"] is None else f"{rss['children']:.0f}"
+    self_rss = "-" if rss["self"] is None else f"{rss['self']:.0f}"
+    print(f"Peak RSS: {self_rss} MB, largest child {children} MB")
+    print(
+        "Accuracy: "
+        + ", ".join(f"{field} {value:.3f}" for field, value in accuracy.items())
+    )
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(result, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""On-disk caches of processing results and of intermediate page stages."""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE_MB = 512
+# A page rendered at 300 DPI takes about 9 MB.
+DEFAULT_STAGE_CACHE_SIZE_MB = 4096
+
+
+def file_hash(path: str | Path) -> str:
+    """SHA-256 of the file contents."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class ResultCache:
+    """Pickled values stored under `folder`, one file per key.
+
+    Once the folder grows past `max_bytes` the least recently used entries
+    are removed first.
+    """
+
+    def __init__(
+        self, folder: str | Path, max_bytes: int = DEFAULT_CACHE_SIZE_MB << 20
+    ):
+        self.folder = Path(folder)
+        self.max_bytes = max_bytes
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.folder / key[:2] / f"{key}.pkl"
+
+    def get(self, key: str) -> Any | None:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        # Reads count as use for the eviction order.
+        os.utime(path)
+        return value
+
+    def put(self, key: str, value: Any):
+        path = self.path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        evict_lru(self.folder.glob("*/*.pkl"), self.max_bytes)
+
+
+def evict_lru(paths: Iterable[Path], max_bytes: int):
+    """Remove the least recently used of `paths` until they fit `max_bytes`."""
+    entries = []
+    total = 0
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink(missing_ok=True)
+        except PermissionError:
+            # Still memory-mapped by a reader on Windows, left for next time.
+            continue
+        total -= size
+        logger.debug(f"Evicted cache entry {path.name}")
+
+
+def stage_key(*parts: Any) -> str:
+    """Cache key of a stage output, from its input key and parameters."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class StageCache:
+    """Outputs of the page stages as NumPy files under `folder`, by key.
+
+    Single arrays are saved as .npy and loaded memory-mapped copy-on-write,
+    so reading a cached page costs no more than the stages touch of it.
+    Groups of small arrays are saved together as .npz. Eviction is least
+    recently used, like `ResultCache`.
+    """
+
+    def __init__(
+        self,
+        folder: str | Path,
+        max_bytes: int = DEFAULT_STAGE_CACHE_SIZE_MB << 20,
+    ):
+        self.folder = Path(folder)
+        self.max_bytes = max_bytes
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str, suffix: str) -> Path:
+        return self.folder / key[:2] / f"{key}{suffix}"
+
+    def contains(self, key: str) -> bool:
+        return self.path(key, ".npy").exists()
+
+    def get_array(self, key: str) -> np.ndarray | None:
+        return self._load(self.path(key, ".npy"), mmap_mode="c")
+
+    def put_array(self, key: str, array: np.ndarray):
+        self._save(self.path(key, ".npy"), lambda f: np.save(f, array))
+
+    def get_arrays(self, key: str) -> dict[str, np.ndarray] | None:
+        data = self._load(self.path(key, ".npz"))
+        if data is None:
+            return None
+        with data:
+            return dict(data)
+
+    def put_arrays(self, key: str, **arrays: np.ndarray):
+        self._save(self.path(key, ".npz"), lambda f: np.savez(f, **arrays))
+
+    def _load(self, path: Path, mmap_mode: str | None = None) -> Any | None:
+        try:
+            value = np.load(path, mmap_mode=mmap_mode)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)
+        return value
+
+    def _save(self, path: Path, write: Callable[[BinaryIO], None]):
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+        evict_lru(
+            (p for p in self.folder.glob("*/*") if p.suffix in (".npy", ".npz")),
+            self.max_bytes,
+        )
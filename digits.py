@@ -0,0 +1,203 @@
+"""In-process digit recognizer for the record number and EGN columns.
+
+Digits are segmented with connected components and classified by their
+nearest template. The templates come from `digit_model.npz` next to this
+file if it exists, otherwise from the Hershey fonts built into OpenCV.
+
+Build a model from labelled crops, one folder per digit (samples/0/*.png,
+samples/1/*.png, ...), with:
+
+    python digits.py samples -o digit_model.npz
+"""
+
+import argparse
+import itertools
+import logging
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+DIGIT_MODEL_PATH = Path(__file__).with_name("digit_model.npz")
+# Glyphs are compared as DIGIT_SIZE x DIGIT_SIZE images.
+DIGIT_SIZE = 16
+
+TEMPLATE_FONTS = (
+    cv2.FONT_HERSHEY_SIMPLEX,
+    cv2.FONT_HERSHEY_PLAIN,
+    cv2.FONT_HERSHEY_DUPLEX,
+    cv2.FONT_HERSHEY_COMPLEX,
+    cv2.FONT_HERSHEY_TRIPLEX,
+)
+
+
+def normalize_glyph(bw: np.ndarray) -> np.ndarray:
+    """Feature vector of a binarized glyph, ink is non-zero.
+
+    The glyph is cropped to its ink, centered on a square keeping its aspect
+    ratio and scaled to DIGIT_SIZE. The vector has zero mean and unit norm,
+    so dot products between vectors are correlations.
+    """
+    ys, xs = np.nonzero(bw)
+    if ys.size == 0:
+        return np.zeros(DIGIT_SIZE * DIGIT_SIZE, np.float32)
+    glyph = bw[ys.min() : ys.max() + 1, xs.min() : xs.max() + 1]
+    h, w = glyph.shape
+    side = max(h, w)
+    square = np.zeros((side, side), np.float32)
+    y, x = (side - h) // 2, (side - w) // 2
+    square[y : y + h, x : x + w] = glyph > 0
+    vector = cv2.resize(
+        square, (DIGIT_SIZE, DIGIT_SIZE), interpolation=cv2.INTER_AREA
+    ).ravel()
+    vector -= vector.mean()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def segment_digits(
+    bw: np.ndarray, min_height: int, max_stroke: int
+) -> list[np.ndarray]:
+    """Glyph images of a binarized cell crop, left to right.
+
+    Components lower than `min_height` are specks or punctuation, and strips
+    at most `max_stroke` thick spanning half the crop are table line
+    leftovers; both are dropped. Components overlapping horizontally, like
+    the parts of a broken stroke, are joined into one glyph.
+    """
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    x, y = stats[1:, cv2.CC_STAT_LEFT], stats[1:, cv2.CC_STAT_TOP]
+    w, h = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT]
+    line = ((h <= max_stroke) & (w * 2 >= bw.shape[1])) | (
+        (w <= max_stroke) & (h * 2 >= bw.shape[0])
+    )
+    keep = np.flatnonzero((h >= min_height) & ~line)
+    keep = keep[np.argsort(x[keep], kind="stable")]
+
+    groups: list[list[int]] = []
+    right = -1
+    for n in keep:
+        if groups and x[n] < right:
+            groups[-1].append(n)
+            right = max(right, x[n] + w[n])
+        else:
+            groups.append([n])
+            right = x[n] + w[n]
+
+    glyphs = []
+    for group in groups:
+        x0, x1 = x[group].min(), (x[group] + w[group]).max()
+        y0, y1 = y[group].min(), (y[group] + h[group]).max()
+        mask = np.isin(labels[y0:y1, x0:x1], np.asarray(group) + 1)
+        glyphs.append(mask.astype(np.uint8))
+    return glyphs
+
+
+@dataclass
+class DigitModel:
+    """Nearest-neighbour digit classifier over normalized glyph templates."""
+
+    templates: np.ndarray  # (n, DIGIT_SIZE * DIGIT_SIZE) float32
+    labels: np.ndarray  # (n,) digit of each template
+
+    @classmethod
+    def from_fonts(cls) -> "DigitModel":
+        templates = []
+        labels = []
+        for font, italic, thickness, digit in itertools.product(
+            TEMPLATE_FONTS, (0, cv2.FONT_ITALIC), (1, 2, 3), range(10)
+        ):
+            canvas = np.zeros((96, 96), np.uint8)
+            cv2.putText(
+                canvas, str(digit), (16, 72), font | italic, 2, 255, thickness
+            )
+            templates.append(normalize_glyph(canvas))
+            labels.append(digit)
+        # Pillow ships one scalable sans font, drawn regular and emboldened.
+        font = ImageFont.load_default(size=64)
+        for stroke, digit in itertools.product((0, 2, 4), range(10)):
+            image = Image.new("L", (96, 96), 0)
+            draw = ImageDraw.Draw(image)
+            draw.text((16, 8), str(digit), 255, font, stroke_width=stroke)
+            templates.append(normalize_glyph(np.asarray(image) > 127))
+            labels.append(digit)
+        return cls(np.array(templates, np.float32), np.array(labels))
+
+    @classmethod
+    def from_samples(cls, folder: Path) -> "DigitModel":
+        """Templates from dark-on-light crops in `folder`/0 ... `folder`/9."""
+        templates = []
+        labels = []
+        for digit in range(10):
+            for path in sorted((folder / str(digit)).glob("*.png")):
+                gray = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+                _, bw = cv2.threshold(
+                    gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU
+                )
+                templates.append(normalize_glyph(bw))
+                labels.append(digit)
+        if not templates:
+            raise FileNotFoundError(f"No digit samples found in {folder}")
+        return cls(np.array(templates, np.float32), np.array(labels))
+
+    @classmethod
+    def load(cls, path: Path) -> "DigitModel":
+        with np.load(path) as data:
+            return cls(data["templates"].astype(np.float32), data["labels"])
+
+    def save(self, path: Path):
+        np.savez_compressed(path, templates=self.templates, labels=self.labels)
+
+    def classify(self, glyphs: list[np.ndarray]) -> tuple[str, float, float]:
+        """Digits of `glyphs`, their lowest match score and lowest margin.
+
+        Scores are correlations in [-1, 1]. The margin of a glyph is how much
+        better its digit matches than the runner-up digit.
+        """
+        if not glyphs:
+            return "", 0.0, 0.0
+        scores = np.stack([normalize_glyph(g) for g in glyphs]) @ self.templates.T
+        # Best score of every digit, (n_glyphs, 10).
+        per_digit = np.full((len(glyphs), 10), -1.0, np.float32)
+        for digit in range(10):
+            per_digit[:, digit] = scores[:, self.labels == digit].max(axis=1)
+        top2 = np.sort(per_digit, axis=1)[:, -2:]
+        text = "".join(str(d) for d in per_digit.argmax(axis=1).tolist())
+        margin = top2[:, 1] - top2[:, 0]
+        return text, float(top2[:, 1].min()), float(margin.min())
+
+
+@cache
+def get_digit_model() -> DigitModel:
+    """Process-wide model, loaded on first use."""
+    if DIGIT_MODEL_PATH.exists():
+        logger.debug(f"Loading digit model {DIGIT_MODEL_PATH}")
+        return DigitModel.load(DIGIT_MODEL_PATH)
+    return DigitModel.from_fonts()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a digit template model")
+    parser.add_argument("samples", type=Path, help="folder with 0/ ... 9/ crops")
+    parser.add_argument("-o", "--output", type=Path, default=DIGIT_MODEL_PATH)
+    parser.add_argument(
+        "--with-fonts",
+        action="store_true",
+        help="keep the built-in font templates next to the samples",
+    )
+    args = parser.parse_args()
+
+    model = DigitModel.from_samples(args.samples)
+    if args.with_fonts:
+        fonts = DigitModel.from_fonts()
+        model = DigitModel(
+            np.concatenate((model.templates, fonts.templates)),
+            np.concatenate((model.labels, fonts.labels)),
+        )
+    model.save(args.output)
+    print(f"Saved {len(model.labels)} templates to {args.output}")
@@ -0,0 +1,317 @@
+"""OCR backends used by `red_pdf.process_ocr`.
+
+- "pytesseract": runs the tesseract CLI once per call (default).
+- "tessapi": keeps a pool of long-lived engines loaded through the
+  libtesseract C API, reused across cells, pages and PDFs of a process.
+"""
+
+import atexit
+import ctypes
+import ctypes.util
+import csv
+import io
+import logging
+import os
+import queue
+import shlex
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pytesseract  # type: ignore
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+OCR_BACKENDS = ("pytesseract", "tessapi")
+
+OcrData = dict[str, list]
+
+# An OMP_THREAD_LIMIT set by the user is never overridden.
+USER_OMP_THREAD_LIMIT = os.environ.get("OMP_THREAD_LIMIT")
+
+
+def limit_omp_threads(limit: int | None):
+    """Cap the OpenMP threads of each tesseract run, None to lift the cap.
+
+    Tesseract processes started afterwards, and worker processes with them,
+    inherit the limit. libtesseract reads it once, when the "tessapi" backend
+    first loads it in a process.
+    """
+    if USER_OMP_THREAD_LIMIT is not None:
+        return
+    if limit is None:
+        os.environ.pop("OMP_THREAD_LIMIT", None)
+    else:
+        os.environ["OMP_THREAD_LIMIT"] = str(limit)
+
+
+class OcrBackend:
+    """Recognizes text in uint8 grayscale or RGB image arrays."""
+
+    name = ""
+
+    def __init__(self, lang: str):
+        self.lang = lang
+
+    def image_to_string(self, image: np.ndarray, config: str = "") -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, image: np.ndarray, config: str = "") -> OcrData:
+        """Word level results in the `pytesseract.Output.DICT` layout."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PytesseractBackend(OcrBackend):
+    name = "pytesseract"
+
+    def image_to_string(self, image: np.ndarray, config: str = "") -> str:
+        return pytesseract.image_to_string(
+            Image.fromarray(image), lang=self.lang, config=config
+        )
+
+    def image_to_data(self, image: np.ndarray, config: str = "") -> OcrData:
+        return pytesseract.image_to_data(
+            Image.fromarray(image),
+            lang=self.lang,
+            config=config,
+            output_type=pytesseract.Output.DICT,
+        )
+
+
+def find_tesseract_library() -> str:
+    """Locate the libtesseract shared library.
+
+    The `TESSERACT_LIBRARY` environment variable takes precedence, then the
+    folder of the tesseract executable used by pytesseract (Windows installs),
+    then the system library search path.
+    """
+    env_path = os.environ.get("TESSERACT_LIBRARY")
+    if env_path:
+        return env_path
+
+    cmd_dir = Path(pytesseract.pytesseract.tesseract_cmd).parent
+    for candidate in sorted(cmd_dir.glob("libtesseract*.dll"), reverse=True):
+        return str(candidate)
+
+    name = ctypes.util.find_library("tesseract")
+    if name is None:
+        raise FileNotFoundError(
+            "libtesseract not found, set TESSERACT_LIBRARY to its path"
+        )
+    return name
+
+
+def load_tesseract_library(path: str) -> ctypes.CDLL:
+    lib = ctypes.CDLL(path)
+    handle = ctypes.c_void_p
+    text = ctypes.POINTER(ctypes.c_char)
+
+    lib.TessBaseAPICreate.restype = handle
+    lib.TessBaseAPICreate.argtypes = []
+    lib.TessBaseAPIInit3.restype = ctypes.c_int
+    lib.TessBaseAPIInit3.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p]
+    lib.TessBaseAPISetVariable.restype = ctypes.c_int
+    lib.TessBaseAPISetVariable.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p]
+    lib.TessBaseAPISetPageSegMode.restype = None
+    lib.TessBaseAPISetPageSegMode.argtypes = [handle, ctypes.c_int]
+    lib.TessBaseAPISetImage.restype = None
+    lib.TessBaseAPISetImage.argtypes = [
+        handle,
+        ctypes.c_void_p,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+    ]
+    lib.TessBaseAPIRecognize.restype = ctypes.c_int
+    lib.TessBaseAPIRecognize.argtypes = [handle, ctypes.c_void_p]
+    lib.TessBaseAPIGetUTF8Text.restype = text
+    lib.TessBaseAPIGetUTF8Text.argtypes = [handle]
+    lib.TessBaseAPIGetTsvText.restype = text
+    lib.TessBaseAPIGetTsvText.argtypes = [handle, ctypes.c_int]
+    lib.TessDeleteText.restype = None
+    lib.TessDeleteText.argtypes = [text]
+    lib.TessBaseAPIClear.restype = None
+    lib.TessBaseAPIClear.argtypes = [handle]
+    lib.TessBaseAPIEnd.restype = None
+    lib.TessBaseAPIEnd.argtypes = [handle]
+    lib.TessBaseAPIDelete.restype = None
+    lib.TessBaseAPIDelete.argtypes = [handle]
+    return lib
+
+
+def parse_config(config: str) -> tuple[int | None, dict[str, str]]:
+    """Split a tesseract CLI config string into (psm, variables)."""
+    psm = None
+    variables = {}
+    args = shlex.split(config)
+    n = 0
+    while n < len(args):
+        arg = args[n]
+        if arg == "--psm" and n + 1 < len(args):
+            psm = int(args[n + 1])
+            n += 1
+        elif arg == "-c" and n + 1 < len(args):
+            key, _, value = args[n + 1].partition("=")
+            variables[key] = value
+            n += 1
+        n += 1
+    return psm, variables
+
+
+TSV_INT_COLUMNS = (
+    "level",
+    "page_num",
+    "block_num",
+    "par_num",
+    "line_num",
+    "word_num",
+    "left",
+    "top",
+    "width",
+    "height",
+)
+
+
+def parse_tsv(tsv: str) -> OcrData:
+    """Convert the C API TSV output to the `pytesseract.Output.DICT` layout."""
+    data: OcrData = {key: [] for key in (*TSV_INT_COLUMNS, "conf", "text")}
+    for row in csv.reader(io.StringIO(tsv), delimiter="\t", quoting=csv.QUOTE_NONE):
+        if len(row) < 12 or not row[0].isdigit():
+            continue
+        for key, value in zip(TSV_INT_COLUMNS, row):
+            data[key].append(int(value))
+        data["conf"].append(float(row[10]))
+        data["text"].append(row[11])
+    return data
+
+
+class TessApiBackend(OcrBackend):
+    """Pool of tesseract engines kept alive for the lifetime of the process.
+
+    Engines are created lazily, at most `pool_size` per config string, and
+    handed out to one caller at a time, so the backend is safe to share
+    between threads.
+    """
+
+    name = "tessapi"
+
+    def __init__(self, lang: str, pool_size: int | None = None, library=None):
+        super().__init__(lang)
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self.lib = load_tesseract_library(library or find_tesseract_library())
+        self.datapath = os.environ.get("TESSDATA_PREFIX")
+        self._lock = threading.Lock()
+        self._idle: dict[str, queue.Queue] = {}
+        self._created: dict[str, list[int]] = {}
+
+    def _create_engine(self, config: str) -> int:
+        handle = self.lib.TessBaseAPICreate()
+        datapath = self.datapath.encode() if self.datapath else None
+        if self.lib.TessBaseAPIInit3(handle, datapath, self.lang.encode()) != 0:
+            self.lib.TessBaseAPIDelete(handle)
+            raise RuntimeError(f"Failed to initialize tesseract for {self.lang!r}")
+
+        psm, variables = parse_config(config)
+        if psm is not None:
+            self.lib.TessBaseAPISetPageSegMode(handle, psm)
+        for key, value in variables.items():
+            self.lib.TessBaseAPISetVariable(handle, key.encode(), value.encode())
+        logger.debug(f"Created tesseract engine {self.lang!r}, config {config!r}")
+        return handle
+
+    @contextmanager
+    def engine(self, config: str = "") -> Iterator[int]:
+        with self._lock:
+            idle = self._idle.setdefault(config, queue.Queue())
+            created = self._created.setdefault(config, [])
+            handle = None
+            if idle.empty() and len(created) < self.pool_size:
+                handle = self._create_engine(config)
+                created.append(handle)
+        if handle is None:
+            handle = idle.get()
+        try:
+            yield handle
+        finally:
+            self.lib.TessBaseAPIClear(handle)
+            idle.put(handle)
+
+    def _recognize(self, handle: int, image: np.ndarray):
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+        # Crops of a page buffer have padded rows but contiguous pixels, which
+        # tesseract reads in place through bytes_per_line.
+        if image.dtype != np.uint8 or image.strides[-1] != 1 or (
+            image.ndim == 3 and image.strides[1] != bytes_per_pixel
+        ):
+            image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        self.lib.TessBaseAPISetImage(
+            handle,
+            image.ctypes.data,
+            width,
+            height,
+            bytes_per_pixel,
+            image.strides[0],
+        )
+        if self.lib.TessBaseAPIRecognize(handle, None) != 0:
+            raise RuntimeError("Tesseract failed to recognize image")
+
+    def _take_text(self, text) -> str:
+        if not text:
+            return ""
+        try:
+            return ctypes.string_at(text).decode("utf-8")
+        finally:
+            self.lib.TessDeleteText(text)
+
+    def image_to_string(self, image: np.ndarray, config: str = "") -> str:
+        with self.engine(config) as handle:
+            self._recognize(handle, image)
+            return self._take_text(self.lib.TessBaseAPIGetUTF8Text(handle))
+
+    def image_to_data(self, image: np.ndarray, config: str = "") -> OcrData:
+        with self.engine(config) as handle:
+            self._recognize(handle, image)
+            tsv = self._take_text(self.lib.TessBaseAPIGetTsvText(handle, 0))
+            return parse_tsv(tsv)
+
+    def close(self):
+        with self._lock:
+            for handles in self._created.values():
+                for handle in handles:
+                    self.lib.TessBaseAPIEnd(handle)
+                    self.lib.TessBaseAPIDelete(handle)
+            self._created.clear()
+            self._idle.clear()
+
+
+_backends: dict[tuple[str, str], OcrBackend] = {}
+
+
+def get_ocr_backend(name: str, lang: str) -> OcrBackend:
+    """Return the process-wide backend instance for `name` and `lang`."""
+    key = (name, lang)
+    if key not in _backends:
+        if name == "pytesseract":
+            _backends[key] = PytesseractBackend(lang)
+        elif name == "tessapi":
+            _backends[key] = TessApiBackend(lang)
+        else:
+            raise ValueError(
+                f"Unknown OCR backend {name!r}, expected one of {OCR_BACKENDS}"
+            )
+    return _backends[key]
+
+
+@atexit.register
+def close_ocr_backends():
+    for backend in _backends.values():
+        backend.close()
+    _backends.clear()
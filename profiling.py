@@ -0,0 +1,211 @@
+"""Timing spans and counters of the processing stages.
+
+Instrumented code calls `span` and `count`, which record into the profiler
+made active with `activate`, and do nothing without one. Events are
+attributed to the PDF page set with `page_scope` on the calling thread.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+
+@dataclass
+class ProfileEvent:
+    kind: str  # "span" or "count"
+    name: str
+    # Seconds of a span, amount of a count.
+    value: float
+    pdf: str = ""
+    page: int | None = None
+
+
+ProfileHook = Callable[[ProfileEvent], None]
+
+
+@dataclass
+class Profile:
+    """Collected data of a profiler, sent back as is from worker processes."""
+
+    spans: dict[str, list[float]] = field(default_factory=dict)
+    counts: dict[str, float] = field(default_factory=dict)
+    # Counts and stage seconds of each page, keyed by "pdf:page".
+    pages: dict[str, dict[str, float]] = field(default_factory=dict)
+
+    def add(self, event: ProfileEvent):
+        if event.kind == "span":
+            self.spans.setdefault(event.name, []).append(event.value)
+            name = "seconds"
+        else:
+            self.counts[event.name] = self.counts.get(event.name, 0) + event.value
+            name = event.name
+        if event.page is not None:
+            page = self.pages.setdefault(f"{event.pdf}:{event.page}", {})
+            page[name] = page.get(name, 0) + event.value
+
+    def merge(self, other: "Profile"):
+        for name, durations in other.spans.items():
+            self.spans.setdefault(name, []).extend(durations)
+        for name, value in other.counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+        for key, stats in other.pages.items():
+            page = self.pages.setdefault(key, {})
+            for name, value in stats.items():
+                page[name] = page.get(name, 0) + value
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class Profiler:
+    """Collects the events of a run and passes them on to subscribed hooks.
+
+    Hooks are called on the thread that recorded the event, which may be a
+    pipeline or OCR thread. Profiles merged from worker processes do not go
+    through the hooks.
+    """
+
+    def __init__(self):
+        self.profile = Profile()
+        self.hooks: list[ProfileHook] = []
+        self.started = time.perf_counter()
+        self.stopped: float | None = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, hook: ProfileHook):
+        self.hooks.append(hook)
+
+    def record(self, event: ProfileEvent):
+        with self._lock:
+            self.profile.add(event)
+        for hook in self.hooks:
+            hook(event)
+
+    def merge(self, profile: Profile):
+        with self._lock:
+            self.profile.merge(profile)
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self.stopped or time.perf_counter()) - self.started
+
+    def pages_per_second(self) -> float:
+        seconds = self.wall_seconds
+        return self.profile.counts.get("pages", 0) / seconds if seconds else 0.0
+
+    def stage_stats(self) -> dict[str, dict[str, float]]:
+        """Calls, total seconds and mean, p50 and p95 milliseconds per stage."""
+        stats = {}
+        for name, durations in self.profile.spans.items():
+            total = sum(durations)
+            stats[name] = {
+                "calls": len(durations),
+                "total_s": total,
+                "mean_ms": total / len(durations) * 1000,
+                "p50_ms": percentile(durations, 0.5) * 1000,
+                "p95_ms": percentile(durations, 0.95) * 1000,
+            }
+        return stats
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "wall_s": self.wall_seconds,
+            "pages_per_s": self.pages_per_second(),
+            "counts": self.profile.counts,
+            "stages": self.stage_stats(),
+            "pages": self.profile.pages,
+        }
+
+    def save(self, path: str | Path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def summary_table(self) -> str:
+        lines = [
+            f"{'stage':14} {'calls':>7} {'total s':>9} {'mean ms':>9} "
+            f"{'p50 ms':>9} {'p95 ms':>9}"
+        ]
+        stages = sorted(self.stage_stats().items(), key=lambda s: -s[1]["total_s"])
+        for name, s in stages:
+            lines.append(
+                f"{name:14} {s['calls']:7d} {s['total_s']:9.2f} {s['mean_ms']:9.1f} "
+                f"{s['p50_ms']:9.1f} {s['p95_ms']:9.1f}"
+            )
+        counts = ", ".join(
+            f"{name} {value:g}" for name, value in sorted(self.profile.counts.items())
+        )
+        lines.append(
+            f"{self.profile.counts.get('pages', 0):g} pages in "
+            f"{self.wall_seconds:.1f} s, {self.pages_per_second():.2f} pages/s"
+        )
+        lines.append(f"Counts: {counts}")
+        return "\n".join(lines)
+
+
+_active: Profiler | None = None
+_labels = threading.local()
+
+
+def active() -> Profiler | None:
+    return _active
+
+
+@contextmanager
+def activate(profiler: Profiler | None) -> Iterator[Profiler | None]:
+    """Record the events of the process into `profiler`, None to skip them.
+
+    The profiler is stopped on exit, which fixes its wall time.
+    """
+    global _active
+    previous, _active = _active, profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
+        if profiler is not None:
+            profiler.stop()
+
+
+@contextmanager
+def page_scope(pdf: str, page: int) -> Iterator[None]:
+    """Attribute the events recorded on this thread to a page."""
+    previous = getattr(_labels, "page", None)
+    _labels.page = (pdf, page)
+    try:
+        yield
+    finally:
+        _labels.page = previous
+
+
+def _event(kind: str, name: str, value: float) -> ProfileEvent:
+    pdf, page = getattr(_labels, "page", None) or ("", None)
+    return ProfileEvent(kind, name, value, pdf, page)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the block as a run of the `name` stage."""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record(_event("span", name, time.perf_counter() - start))
+
+
+def count(name: str, value: float = 1):
+    profiler = _active
+    if profiler is not None and value:
+        profiler.record(_event("count", name, value))
@@ -0,0 +1,200 @@
+"""Cancellation of a run and the progress events it reports.
+
+A run checks the token made current with `cancellable` between pages and
+OCR calls, and `check_cancelled` raises `Cancelled` once it is cancelled.
+Progress goes out through a `ProgressReporter`, at most a few events per
+second however fast pages finish.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+# Seconds between two progress events, the last one is always sent.
+PROGRESS_INTERVAL = 0.25
+
+
+class Cancelled(Exception):
+    """Raised in a run whose `CancelToken` was cancelled."""
+
+
+class CancelToken:
+    """Cancels a run from another thread, e.g. the GUI's.
+
+    `event` is a `multiprocessing.Event` for tokens shared with worker
+    processes, a thread event by default.
+    """
+
+    def __init__(self, event: Any = None):
+        self.event = event or threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+
+_token: CancelToken | None = None
+
+
+@contextmanager
+def cancellable(token: CancelToken | None) -> Iterator[CancelToken | None]:
+    """Make `token` the one `check_cancelled` checks, None for no token."""
+    global _token
+    previous, _token = _token, token
+    try:
+        yield token
+    finally:
+        _token = previous
+
+
+def current() -> CancelToken | None:
+    """The token of the running run, None when it cannot be cancelled."""
+    return _token
+
+
+def install(event: Any):
+    """Worker process initializer, checks `event` for the rest of the process."""
+    global _token
+    _token = CancelToken(event)
+
+
+def check_cancelled():
+    token = _token
+    if token is not None and token.cancelled:
+        raise Cancelled("Processing cancelled")
+
+
+@dataclass
+class ProgressEvent:
+    message: str
+    # Estimated share of the run done, 0 to 100.
+    percent: float
+    files_done: int
+    files_total: int
+    pages_done: int
+    cells_done: int
+    pages_per_second: float
+    # None until there is enough progress to estimate it.
+    eta_seconds: float | None
+
+    def eta_text(self) -> str:
+        if self.eta_seconds is None:
+            return ""
+        minutes, seconds = divmod(round(self.eta_seconds), 60)
+        return f"{minutes}:{seconds:02d} left"
+
+
+class ProgressReporter:
+    """Tracks the progress of a run and sends it as `ProgressEvent`s.
+
+    `on_event` gets the latest state at most every `interval` seconds.
+    Updates that come sooner are held back and sent together when the
+    interval is up, and the final one is always sent at once.
+    """
+
+    def __init__(
+        self,
+        on_event: Callable[[ProgressEvent], None],
+        files_total: int,
+        files_done: int = 0,
+        interval: float = PROGRESS_INTERVAL,
+    ):
+        self.on_event = on_event
+        self.files_total = files_total
+        self.interval = interval
+        # Files done before the run started, e.g. in a resumed report.
+        self.files_before = files_done
+        # Share done of every file worked on in this run, 1.0 once finished.
+        self.fractions: dict[int, float] = {}
+        self.started = time.monotonic()
+        self.start_percent = self.percent()
+        self.last_sent: float | None = None
+        self.pending = False
+        self.timer: threading.Timer | None = None
+        self.lock = threading.Lock()
+        self.event = ProgressEvent(
+            "", self.start_percent, files_done, files_total, 0, 0, 0.0, None
+        )
+
+    def percent(self) -> float:
+        """Share of the run done, from the files done and the ones under way."""
+        done = self.files_before + sum(self.fractions.values())
+        return 100 * done / self.files_total if self.files_total else 0.0
+
+    def update(
+        self,
+        message: str | None = None,
+        file: int | None = None,
+        fraction: float | None = None,
+        pages: int = 0,
+        cells: int = 0,
+        final: bool = False,
+    ):
+        """Add the `pages` and `cells` done and set the other given fields.
+
+        `fraction` is the share done of the file numbered `file`, 1.0 once
+        it is finished. A `final` update reports the run as complete.
+        """
+        with self.lock:
+            event = self.event
+            if message is not None:
+                event.message = message
+            if file is not None and fraction is not None:
+                self.fractions[file] = max(0.0, min(fraction, 1.0))
+            event.pages_done += pages
+            event.cells_done += cells
+            self.pending = True
+
+            now = time.monotonic()
+            wait = 0.0
+            if not final and self.last_sent is not None:
+                wait = self.last_sent + self.interval - now
+            if wait <= 0:
+                self._send(now, final)
+            elif self.timer is None:
+                self.timer = threading.Timer(wait, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """Send the updates held back since the last event, if any."""
+        with self.lock:
+            self.timer = None
+            if self.pending:
+                self._send(time.monotonic())
+
+    def close(self):
+        """Drop the updates held back, e.g. once the run failed."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.pending = False
+
+    def _send(self, now: float, final: bool = False):
+        event = self.event
+        event.files_done = self.files_before + sum(
+            fraction >= 1.0 for fraction in self.fractions.values()
+        )
+        event.percent = 100.0 if final else self.percent()
+        elapsed = now - self.started
+        event.pages_per_second = event.pages_done / elapsed if elapsed else 0.0
+        # Estimated from the progress made in this run, not counting files
+        # done before it.
+        event.eta_seconds = None
+        if event.percent >= 100:
+            event.eta_seconds = 0.0
+        elif event.percent > self.start_percent:
+            event.eta_seconds = (
+                elapsed
+                * (100 - event.percent)
+                / (event.percent - self.start_percent)
+            )
+        self.last_sent = now
+        self.pending = False
+        self.on_event(ProgressEvent(**vars(event)))
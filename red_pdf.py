@@ -1,12 +1,23 @@
-from dataclasses import asdict, dataclass, fields
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field, fields, replace
+from functools import partial
 from datetime import datetime
-import csv
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import queue
+import subprocess
+import sys
+import threading
 from cv2.typing import MatLike
 from pathlib import Path
-from typing import Any, Callable, TypeAlias
+from typing import Any, Callable, Collection, Iterable, Iterator, TypeAlias
 
-from pdf2image import convert_from_path
-import pytesseract  # type: ignore
+from pdf2image import pdfinfo_from_path
 import re
 import cv2
 import numpy as np
@@ -14,6 +25,24 @@ from PIL import Image
 from collections import namedtuple
 import logging
 
+from cache import (
+    DEFAULT_CACHE_SIZE_MB,
+    DEFAULT_STAGE_CACHE_SIZE_MB,
+    ResultCache,
+    StageCache,
+    file_hash,
+    stage_key,
+)
+from digits import get_digit_model, segment_digits
+from ocr import OCR_BACKENDS, OcrBackend, get_ocr_backend, limit_omp_threads
+import profiling
+import progress
+from profiling import Profile, Profiler
+from progress import CancelToken, ProgressEvent, ProgressReporter
+from report import CheckpointedReport, find_interrupted_report
+from results_db import ResultStore, StoredRun
+from version import __version__
+
 logger = logging.getLogger(__name__)
 Reason: TypeAlias = str
 CellCoord = namedtuple("CellCoord", ["x", "y", "w", "h"])
@@ -23,6 +52,7 @@ WHITE = (255, 255, 255)
 BLUE = (0, 0, 255)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
+ORANGE = (255, 140, 0)
 
 INC_THRESHOLD_MIN = 600
 INC_THRESHOLD_MID = 1200
@@ -49,6 +79,8 @@ COLUMN_NOTE = 15
 
 SIGNATURE_COLUMNS = {COLUMN_DATE, COLUMN_SIGNATURE, COLUMN_NOTE}
 TEXT_COLUMNS = {COLUMN_RECORD_NUM, COLUMN_NAME, COLUMN_ADDRESS, COLUMN_EGN}
+# Text columns that only hold digits.
+NUMBER_COLUMNS = {COLUMN_RECORD_NUM, COLUMN_EGN}
 
 COL_AVG_WIDTHS = [
     145,
@@ -89,41 +121,178 @@ COL_AVG_XS = [
 ]
 
 
-def pdf_to_images(pdf_path, dpi=300) -> list[Image.Image]:
-    return convert_from_path(pdf_path, dpi=dpi)
+RENDER_DPI = 300
+PAGE_RENDER_WINDOW = 1
+# Only the bottom quarter of the rotated first page holds the table.
+FIRST_PAGE_TABLE_PERC = 25
+
+
+# Pixel sizes above are measured on pages rendered at REFERENCE_DPI and are
+# scaled with `px` for other resolutions.
+REFERENCE_DPI = 300
+
+LINE_SENSITIVITY = 30
+CELL_MIN_W = 30
+CELL_MIN_H = 20
+
+
+def px(value: int, dpi: int) -> int:
+    """Convert a pixel size at REFERENCE_DPI to `dpi`."""
+    return round(value * dpi / REFERENCE_DPI)
+
 
+def scale_cell(cell: CellCoord, factor: float) -> CellCoord:
+    x, y = round(cell.x * factor), round(cell.y * factor)
+    w = round((cell.x + cell.w) * factor) - x
+    h = round((cell.y + cell.h) * factor) - y
+    return CellCoord(x, y, w, h)
 
-def crop_image_bottom(image: Image.Image, perc=50) -> Image.Image:
-    w, h = image.size
-    top = h - int(h * (perc / 100))
-    bottom = h
-    crop = image.crop(box=(0, top, w, bottom))
-    return crop
 
+def scale_cells(cells: np.ndarray, factor: float) -> np.ndarray:
+    """`scale_cell` for an array of (x, y, w, h) rows."""
+    start = np.rint(cells[..., :2] * factor)
+    end = np.rint((cells[..., :2] + cells[..., 2:]) * factor)
+    return np.concatenate((start, end - start), axis=-1).astype(np.int32)
 
-def crop_image_center(image: Image.Image, perc=50) -> Image.Image:
-    w, h = image.size
-    center_length = int(h * (perc / 100))
-    top = int((h - center_length) / 2)
-    bottom = top + center_length
-    crop = image.crop(box=(0, top, w, bottom))
-    return crop
 
+def pdf_page_count(pdf_path) -> int:
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
 
-def crop_image_top(image: Image.Image, perc=50) -> Image.Image:
-    w, h = image.size
-    top = 0
-    bottom = int(h * (perc / 100))
-    crop = image.crop(box=(0, top, w, bottom))
-    return crop
 
+def page_size_px(pdfinfo: dict, dpi: int) -> tuple[int, int]:
+    """Rendered (width, height) of the pages described by `pdfinfo`."""
+    m = re.match(r"([\d.]+) x ([\d.]+)", pdfinfo["Page size"])
+    if m is None:
+        raise ValueError(f"Unexpected page size {pdfinfo['Page size']!r}")
+    w_pts, h_pts = float(m.group(1)), float(m.group(2))
+    return math.ceil(w_pts * dpi / 72), math.ceil(h_pts * dpi / 72)
 
-def preprocess(img: Image.Image) -> MatLike:
-    gray = cv2.cvtColor(np.array(img), cv2.COLOR_BGR2GRAY)
 
-    # Binary inverse (table lines become white)
-    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-    return bw
+def first_page_region(pdfinfo: dict, dpi: int) -> CellCoord:
+    """Pixel box of the rendered first page that holds the table.
+
+    Pages are rotated 90° counterclockwise before processing, so the bottom
+    of the rotated page is the left side of the rendered one.
+    """
+    w, h = page_size_px(pdfinfo, dpi)
+    return CellCoord(0, 0, int(w * (FIRST_PAGE_TABLE_PERC / 100)), h)
+
+
+PPM_HEADER = re.compile(rb"P([56])\s+(\d+)\s+(\d+)\s+\d+\s")
+
+
+def parse_ppm_stream(data: bytes) -> list[np.ndarray]:
+    """Split concatenated binary PPM/PGM images into arrays over `data`."""
+    images = []
+    offset = 0
+    while offset < len(data):
+        m = PPM_HEADER.match(data, offset)
+        if m is None:
+            raise ValueError(f"Invalid PPM header at byte {offset}")
+        w, h = int(m.group(2)), int(m.group(3))
+        shape = (h, w, 3) if m.group(1) == b"6" else (h, w)
+        size = math.prod(shape)
+        images.append(
+            np.frombuffer(data, np.uint8, count=size, offset=m.end()).reshape(shape)
+        )
+        offset = m.end() + size
+    return images
+
+
+def render_pages(
+    pdf_path,
+    first_page: int,
+    last_page: int,
+    dpi: int = RENDER_DPI,
+    region: CellCoord | None = None,
+    grayscale: bool = True,
+) -> list[np.ndarray]:
+    """Rasterize a page range with pdftoppm.
+
+    With a `region` (pixels at `dpi`), poppler renders only that box of each
+    page instead of the whole page.
+    """
+    args = ["pdftoppm", "-r", str(dpi), "-f", str(first_page), "-l", str(last_page)]
+    if grayscale:
+        args.append("-gray")
+    if region is not None:
+        x, y, w, h = (str(v) for v in region)
+        args.extend(["-x", x, "-y", y, "-W", w, "-H", h])
+    args.append(str(pdf_path))
+
+    startupinfo = None
+    if sys.platform == "win32":
+        # Keeps a console window from popping up for every call.
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    with profiling.span("render"):
+        proc = subprocess.run(args, capture_output=True, startupinfo=startupinfo)
+        if proc.returncode != 0:
+            raise RuntimeError(
+                f"pdftoppm failed for {pdf_path}: "
+                f"{proc.stderr.decode(errors='replace')}"
+            )
+        return parse_ppm_stream(proc.stdout)
+
+
+def page_runs(pagenums: list[int], window: int) -> Iterator[tuple[int, int]]:
+    """(first, last) 1-based page ranges of at most `window` consecutive pages."""
+    start = 0
+    for n in range(1, len(pagenums) + 1):
+        if (
+            n == len(pagenums)
+            or pagenums[n] != pagenums[n - 1] + 1
+            or n - start == window
+        ):
+            yield pagenums[start] + 1, pagenums[n - 1] + 1
+            start = n
+
+
+def iter_pdf_images(
+    pdf_path,
+    dpi=RENDER_DPI,
+    window=PAGE_RENDER_WINDOW,
+    pages: Collection[int] | None = None,
+) -> Iterator[np.ndarray]:
+    """Render a PDF `window` pages at a time.
+
+    Only the current window is held in memory, so peak memory does not grow
+    with the number of pages in the PDF. The first page is rendered only in
+    its table region, see `first_page_region`. `pages` selects the 0-based
+    page numbers to render, in order, all of them by default.
+    """
+    pdfinfo = pdfinfo_from_path(pdf_path)
+    n_pages = int(pdfinfo["Pages"])
+    if pages is None:
+        pages = range(n_pages)
+    pagenums = sorted(n for n in set(pages) if 0 <= n < n_pages)
+    pdf_name = Path(pdf_path).name
+    if pagenums and pagenums[0] == 0:
+        with profiling.page_scope(pdf_name, 0):
+            images = render_pages(
+                pdf_path, 1, 1, dpi=dpi, region=first_page_region(pdfinfo, dpi)
+            )
+        yield from images
+        pagenums = pagenums[1:]
+    for first_page, last_page in page_runs(pagenums, window):
+        # Windows of several pages are timed as their first page.
+        with profiling.page_scope(pdf_name, first_page - 1):
+            images = render_pages(pdf_path, first_page, last_page, dpi=dpi)
+        yield from images
+
+
+def rotate_image_90(image: np.ndarray) -> np.ndarray:
+    """Counterclockwise rotation as a view, no pixels are copied."""
+    return np.rot90(image)
+
+
+def preprocess(img: np.ndarray) -> MatLike:
+    with profiling.span("preprocess"):
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        # Binary inverse (table lines become white)
+        _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        return bw
 
 
 def get_vertical_lines(bw, sensitivity=50):
@@ -145,134 +314,690 @@ def combine_lines(vertical, horizontal):
     return table
 
 
-def find_cells(table_img) -> list[CellCoord]:
+def find_cells(table_img, min_w=CELL_MIN_W, min_h=CELL_MIN_H) -> np.ndarray:
+    """Bounding boxes of the contours of `table_img` as (x, y, w, h) rows."""
     contours, _ = cv2.findContours(table_img, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
 
-    boxes = []
-    for c in contours:
-        x, y, w, h = cv2.boundingRect(c)
-        if w > 30 and h > 20:  # filter noise
-            boxes.append(CellCoord(x, y, w, h))
+    boxes = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int32)
+    boxes = boxes.reshape(-1, 4)
+    # filter noise
+    return boxes[(boxes[:, 2] > min_w) & (boxes[:, 3] > min_h)]
 
-    return boxes
 
+@dataclass
+class CellGrid:
+    """Table cells as an (n_rows, N_COLUMNS, 4) int32 array of x, y, w, h.
 
-def group_cells_by_row(cells: list[CellCoord], y_threshold):
-    # Ensure we have CellCoord objects and group by Y proximity.
+    `reconstructed` is the (n_rows, N_COLUMNS) mask of the cells that were
+    created or resized from the average column layout.
+    """
 
-    rows: list[list[CellCoord]] = [[]]
-    cells.sort(key=lambda c: c.y)
-    row_y = cells[0].y
-    row = rows[0]
+    cells: np.ndarray
+    reconstructed: np.ndarray
 
-    for cell in cells:
-        placed = False
+    @property
+    def n_rows(self) -> int:
+        return self.cells.shape[0]
 
-        if abs(cell.y - row_y) < y_threshold:
-            row.append(cell)
-            placed = True
-            row_y = (cell.y + row_y) // 2
+    def shifted(self, dx: int, dy: int) -> "CellGrid":
+        offset = np.array([dx, dy, 0, 0], dtype=np.int32)
+        return CellGrid(self.cells + offset, self.reconstructed.copy())
 
-        if not placed:
-            row = [cell]
-            rows.append(row)
-            row_y = cell.y
+    def cell(self, row_ndx: int, col_ndx: int) -> CellCoord:
+        return CellCoord(*self.cells[row_ndx, col_ndx].tolist())
 
-    for row in rows:
-        row.sort(key=lambda c: c.x)
-    return rows
+    def rows(self) -> list[list[CellCoord]]:
+        return [[CellCoord(*cell) for cell in row] for row in self.cells.tolist()]
 
 
-def draw_cell_img(cell: CellCoord, img: Image.Image, clr=RED) -> Image.Image:
-    x, y, w, h = cell
-    arr = cv2.rectangle(np.array(img), (x, y), (x + w, y + h), clr, 2)
-    return Image.fromarray(arr)
+def cluster_rows(ys: np.ndarray, y_threshold: int) -> np.ndarray:
+    """Row index of each of the ascending `ys`.
+
+    A new row starts wherever the gap to the previous cell is at least
+    `y_threshold`.
+    """
+    if ys.size == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.r_[0, np.cumsum(np.diff(ys) >= y_threshold)]
 
 
-def draw_cell_arr(cell: CellCoord, arr: np.ndarray, clr=RED) -> np.ndarray:
-    x, y, w, h = cell
-    return cv2.rectangle(arr, (x, y), (x + w, y + h), clr, 2)
+def build_cell_grid(cells: np.ndarray, dpi: int = REFERENCE_DPI) -> CellGrid:
+    """Group detected cells into rows and snap them to the table columns.
+
+    Rows with all N_COLUMNS cells are taken as detected. In the others each
+    cell is matched to the closest column within CELL_ROW_X_THRESHOLD,
+    cells that are too wide or narrow get the average column width and
+    missing cells are filled in from the average column layout.
+    """
+    if len(cells) == 0:
+        return CellGrid(
+            np.empty((0, N_COLUMNS, 4), dtype=np.int32),
+            np.empty((0, N_COLUMNS), dtype=bool),
+        )
+    cells = cells[np.argsort(cells[:, 1], kind="stable")]
+    row_ids = cluster_rows(cells[:, 1], px(CELL_ROW_Y_THRESHOLD, dpi))
+    order = np.lexsort((cells[:, 0], row_ids))
+    cells, row_ids = cells[order], row_ids[order]
+    n_rows = int(row_ids[-1]) + 1
+    counts = np.bincount(row_ids, minlength=n_rows)
+
+    avg_xs = np.array([px(x, dpi) for x in COL_AVG_XS])
+    avg_ws = np.array([px(w, dpi) for w in COL_AVG_WIDTHS])
+    distance = np.abs(cells[:, :1] - avg_xs)
+    col_ids = distance.argmin(axis=1)
+    col_distance = distance[np.arange(len(cells)), col_ids]
+    matched = col_distance <= px(CELL_ROW_X_THRESHOLD, dpi)
+
+    complete = counts[row_ids] == N_COLUMNS
+    row_starts = np.r_[0, np.cumsum(counts)[:-1]]
+    col_ids[complete] = (np.arange(len(cells)) - row_starts[row_ids])[complete]
+    matched[complete] = True
+
+    # Written farthest first, so the closest cell wins a shared column.
+    idx = np.flatnonzero(matched)
+    idx = idx[np.argsort(-col_distance[idx], kind="stable")]
+    grid = np.zeros((n_rows, N_COLUMNS, 4), dtype=np.int32)
+    found = np.zeros((n_rows, N_COLUMNS), dtype=bool)
+    grid[row_ids[idx], col_ids[idx]] = cells[idx]
+    found[row_ids[idx], col_ids[idx]] = True
+
+    resized = found & (
+        np.abs(grid[..., 2] - avg_ws) > px(CELL_COLUMN_W_THRESHOLD, dpi)
+    )
+    resized[counts == N_COLUMNS] = False
+    grid[..., 2][resized] = np.broadcast_to(avg_ws, resized.shape)[resized]
+
+    missing = ~found
+    row_y = np.bincount(row_ids, weights=cells[:, 1], minlength=n_rows) / counts
+    row_h = np.bincount(row_ids, weights=cells[:, 3], minlength=n_rows) / counts
+    filler = np.stack(
+        np.broadcast_arrays(
+            avg_xs, np.rint(row_y)[:, None], avg_ws, np.rint(row_h)[:, None]
+        ),
+        axis=-1,
+    )
+    grid[missing] = filler[missing]
+    return CellGrid(grid, resized | missing)
+
+
+@dataclass
+class ProcessOptions:
+    """Per-run processing options, passed as-is to the pool workers."""
+
+    ocr_mode: str = "cell"
+    ocr_backend: str = "pytesseract"
+    # Cells OCRed concurrently within a page, 0 to split the CPU cores
+    # between the PDF workers.
+    ocr_threads: int = 1
+    # Leave text cells without any ink out of OCR.
+    skip_blank_cells: bool = True
+    # "tesseract" reads NUMBER_COLUMNS with a digits-only config, "templates"
+    # tries the in-process digit recognizer on EGNs first.
+    digit_reader: str = "tesseract"
+    # Render pages at this lower DPI and OCR again at RENDER_DPI only the
+    # text cells read with low confidence or failing validation.
+    first_pass_dpi: int | None = None
+    # Grid detection runs on a copy downscaled to this DPI, None for full DPI.
+    detect_dpi: int | None = None
+    # Reuse the grid of the first clean page for the rest of each PDF.
+    grid_template: bool = False
+    grid_detector: str = "morphology"
+    # Write JPEG previews of the pages QA should check to this folder, see
+    # `write_overlay`. Only an output, not part of the processing fingerprint.
+    overlay_dir: str | None = None
 
 
 @dataclass
 class Page:
     pdf_name: str
     pagenum: int
-    image: Image.Image
+    # Contiguous grayscale uint8 buffer, every stage works on views of it.
+    image: np.ndarray
+    # `image` binarized by `preprocess`, ink is 255.
+    binary: np.ndarray
     table_border: CellCoord
-    rows: list[list[CellCoord]]
-    reconstructed: dict[tuple[int, int], CellCoord] | None = None
+    grid: CellGrid
+    dpi: int = REFERENCE_DPI
+    # "detected", or "template" if the grid was registered from another page.
+    grid_source: str = "detected"
+    # Text cells found blank and left out of OCR, set by `process_ocr`.
+    blank_cells: int = 0
+    # Source PDF, for rendering parts of the page again at another DPI.
+    pdf_path: Path | None = None
+
+    @property
+    def rows(self) -> list[list[CellCoord]]:
+        return self.grid.rows()
+
+    @property
+    def reconstructed(self) -> dict[tuple[int, int], CellCoord] | None:
+        keys = zip(*np.nonzero(self.grid.reconstructed))
+        return {
+            (row_ndx, col_ndx): self.grid.cell(row_ndx, col_ndx)
+            for row_ndx, col_ndx in ((int(r), int(c)) for r, c in keys)
+        } or None
+
+
+def detect_grid(
+    bw: np.ndarray, dpi: int = REFERENCE_DPI
+) -> tuple[CellCoord, np.ndarray] | None:
+    """Find the table border and the (x, y, w, h) rows of its cells.
+
+    `bw` is the page binarized by `preprocess`. Returns None if no table is
+    found.
+    """
+    sensitivity = px(LINE_SENSITIVITY, dpi)
+    if dpi != REFERENCE_DPI:
+        # An even kernel shifts the opened lines by about a pixel per
+        # iteration. Thin low-DPI lines then no longer meet at the table
+        # border, so scaled kernels are kept odd.
+        sensitivity |= 1
+
+    with profiling.span("lines"):
+        vertical = get_vertical_lines(bw, sensitivity=sensitivity)
+        horizontal = get_horizontal_lines(bw, sensitivity=sensitivity)
+        table_lines = combine_lines(vertical, horizontal)
+    with profiling.span("find_cells"):
+        cells = find_cells(
+            table_lines, min_w=px(CELL_MIN_W, dpi), min_h=px(CELL_MIN_H, dpi)
+        )
+    if not len(cells):
+        return None
+    return CellCoord(*cells[0].tolist()), cells[1:]
 
 
-def reconstruct_missing_cells(page: Page):
-    reconstructed = {}
-    for row_ndx, row in enumerate(page.rows):
-        if len(row) == N_COLUMNS:
-            continue
-        logger.warning(
-            f"Page {page.pdf_name}, page {page.pagenum}, row {row_ndx}, N columns {len(row)}, expected {N_COLUMNS}"
+# A row or column of the binarized page is a table line if at least this
+# share of it is ink.
+PROJECTION_LINE_FILL = 0.5
+# Largest rise or fall of the table lines across the table width, in pixels
+# at REFERENCE_DPI, for the projections to be trusted.
+PROJECTION_MAX_DRIFT = 8
+
+
+def line_runs(profile: np.ndarray, min_value: float, min_gap: int) -> np.ndarray:
+    """(start, end) rows of the runs of `profile` above `min_value`.
+
+    Runs separated by less than `min_gap` are merged into one line.
+    """
+    idx = np.flatnonzero(profile > min_value)
+    if idx.size == 0:
+        return np.empty((0, 2), dtype=int)
+    breaks = np.flatnonzero(np.diff(idx) > min_gap)
+    starts = idx[np.r_[0, breaks + 1]]
+    ends = idx[np.r_[breaks, idx.size - 1]]
+    return np.column_stack((starts, ends))
+
+
+def line_drift(bw: np.ndarray, left: int, right: int, min_gap: int) -> float | None:
+    """Vertical drift of the horizontal lines of `bw` from `left` to `right`.
+
+    Compares the lines found in the left and right half of the span, None
+    if the halves do not find the same number of lines.
+    """
+    mid = (left + right) // 2
+    centers = []
+    for start, end in ((left, mid), (mid, right + 1)):
+        profile = np.count_nonzero(bw[:, start:end], axis=1)
+        runs = line_runs(profile, PROJECTION_LINE_FILL * (end - start), min_gap)
+        centers.append(runs.mean(axis=1))
+    if len(centers[0]) != len(centers[1]) or not len(centers[0]):
+        return None
+    # The halves' centers are half the span apart.
+    return 2 * float(np.median(centers[1] - centers[0]))
+
+
+def detect_grid_projection(
+    bw: np.ndarray, dpi: int = REFERENCE_DPI
+) -> tuple[CellCoord, np.ndarray] | None:
+    """Find the table from the row and column ink projections of `bw`.
+
+    Table lines are the rows, then the columns within the table height,
+    that are mostly ink. The cells are the gaps between consecutive lines,
+    and the border is the span of the outermost lines, so the result does
+    not depend on contour ordering. Returns None if no table is found, or
+    if the lines do not make a plausible table, e.g. on a skewed scan.
+    """
+    # Lines and cells come out of the same projections, timed as one stage.
+    with profiling.span("lines"):
+        row_profile = np.count_nonzero(bw, axis=1)
+        h_lines = line_runs(
+            row_profile, PROJECTION_LINE_FILL * row_profile.max(), px(CELL_MIN_H, dpi)
         )
-        created = []
+        if len(h_lines) < 2:
+            return None
+        top, bottom = int(h_lines[0, 0]), int(h_lines[-1, 1])
 
-        for col_ndx in range(N_COLUMNS):
-            avg_w = COL_AVG_WIDTHS[col_ndx]
-            avg_x = COL_AVG_XS[col_ndx]
-            cell = row[col_ndx] if col_ndx < len(row) else row[-1]
-
-            if abs(cell.x - avg_x) > CELL_ROW_X_THRESHOLD:
-                new = CellCoord(x=avg_x, y=cell.y, w=avg_w, h=cell.h)
-                created.append(new)
-                reconstructed[(row_ndx, col_ndx)] = new
-                logger.warning(f"  Reconstructed cell at ({row_ndx}, {col_ndx})")
-            elif abs(cell.w - avg_w) > CELL_COLUMN_W_THRESHOLD:
-                new = CellCoord(x=cell.x, y=cell.y, w=avg_w, h=cell.h)
-                if col_ndx < len(row):
-                    row[col_ndx] = new
-                else:
-                    created.append(new)
-                reconstructed[(row_ndx, col_ndx)] = new
-                logger.warning(f"  Reconstructed cell at ({row_ndx}, {col_ndx})")
-
-        for cell in created:
-            row.append(cell)
-            row.sort(key=lambda c: c.x)
-    page.reconstructed = reconstructed or None
-
-
-def process_pdf(pdf: Path) -> list[Page]:
-    logging.info(f"Processing File: {pdf.name} - started")
-    images = pdf_to_images(pdf)
-    logger.debug(f"Extracted {len(images)} pages")
+        col_profile = np.count_nonzero(bw[top : bottom + 1], axis=0)
+        v_lines = line_runs(
+            col_profile, PROJECTION_LINE_FILL * (bottom - top + 1), px(CELL_MIN_W, dpi)
+        )
+        if len(v_lines) < 2:
+            return None
+        left, right = int(v_lines[0, 0]), int(v_lines[-1, 1])
+
+        # Cell interiors run from the pixel after one line to the pixel before
+        # the next, like the contour boxes of `find_cells`.
+        xs = v_lines[:-1, 1] + 1
+        ws = v_lines[1:, 0] - v_lines[:-1, 1] - 1
+        ys = h_lines[:-1, 1] + 1
+        hs = h_lines[1:, 0] - h_lines[:-1, 1] - 1
+        # On a skewed scan a ruled line spans several pixel rows, which can
+        # fall apart into separate runs with sliver rows between them. Such
+        # pages are left to the morphology detector, see `find_page_grid`.
+        drift = line_drift(bw[top : bottom + 1], left, right, px(CELL_MIN_H, dpi))
+        if (
+            drift is None
+            or abs(drift) > px(PROJECTION_MAX_DRIFT, dpi)
+            or len(v_lines) != N_COLUMNS + 1
+            or hs.min() < px(CELL_MIN_H, dpi)
+        ):
+            logger.debug(
+                f"Projection grid rejected: line drift {drift} px, "
+                f"{len(v_lines)} column lines, rows {hs.min()}-{hs.max()} px high"
+            )
+            return None
+        n_rows, n_cols = len(ys), len(xs)
+        cells = np.stack(
+            (
+                np.tile(xs, n_rows),
+                np.repeat(ys, n_cols),
+                np.tile(ws, n_rows),
+                np.repeat(hs, n_cols),
+            ),
+            axis=1,
+        ).astype(np.int32)
+        table_border = CellCoord(left, top, right - left + 1, bottom - top + 1)
+        return table_border, cells
+
+
+GRID_DETECTORS = {
+    "morphology": detect_grid,
+    "projection": detect_grid_projection,
+}
+
+
+def scan_grid(
+    image: np.ndarray,
+    dpi: int,
+    detect_dpi: int | None = None,
+    detector: str = "morphology",
+    bw: np.ndarray | None = None,
+) -> tuple[CellCoord, CellGrid] | None:
+    """Run a grid detector and build the cell grid at `dpi`.
+
+    The detector runs on a copy downscaled to `detect_dpi` if that is lower.
+    `bw` is the already binarized `image`, if there is one.
+    """
+    if detector not in GRID_DETECTORS:
+        expected = list(GRID_DETECTORS)
+        raise ValueError(f"Unknown grid detector {detector!r}, expected {expected}")
+    detect = GRID_DETECTORS[detector]
+    detect_dpi = detect_dpi or dpi
+    if detect_dpi >= dpi:
+        found = detect(preprocess(image) if bw is None else bw, dpi=dpi)
+    else:
+        # Grid lines survive downscaling, so the detector runs on the small
+        # copy and the cells are scaled back to `dpi`.
+        scale = detect_dpi / dpi
+        with profiling.span("downscale"):
+            small = cv2.resize(
+                image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+        found = detect(preprocess(small), dpi=detect_dpi)
+        if found is not None:
+            table_border, cells = found
+            found = (
+                scale_cell(table_border, 1 / scale),
+                scale_cells(cells, 1 / scale),
+            )
+    if found is None:
+        return None
+    table_border, cells = found
+    with profiling.span("build_grid"):
+        return table_border, build_cell_grid(cells, dpi)
 
-    pages = []
-    for pagenum, image in enumerate(images):
-        image = image.transpose(Image.Transpose.ROTATE_90)
-        if pagenum == 0:
-            image = crop_image_bottom(image, perc=25)
 
-        bw = preprocess(image)
-        vertical = get_vertical_lines(bw, sensitivity=30)
-        horizontal = get_horizontal_lines(bw, sensitivity=30)
+TEMPLATE_MAX_SHIFT = 60
+TEMPLATE_MIN_CONFIDENCE = 0.9
 
-        table_lines = combine_lines(vertical, horizontal)
-        cells = find_cells(table_lines)
-        if not cells:
-            ValueError(f"Failed to find table in page {pagenum}, file: {pdf.name}")
-        table_border = cells.pop(0)
-        rows = group_cells_by_row(cells, y_threshold=CELL_ROW_Y_THRESHOLD)
-        page = Page(
-            pdf_name=pdf.name,
-            pagenum=pagenum,
-            image=image,
-            table_border=table_border,
-            rows=rows,
+
+def standardize(profile: np.ndarray) -> np.ndarray:
+    std = profile.std()
+    return (profile - profile.mean()) / std if std else profile - profile.mean()
+
+
+def ink_profiles(bw: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Standardized column and row projections of the binarized page."""
+    return (
+        standardize(bw.sum(axis=0, dtype=np.float64)),
+        standardize(bw.sum(axis=1, dtype=np.float64)),
+    )
+
+
+def best_shift(
+    profile: np.ndarray, template: np.ndarray, max_shift: int
+) -> tuple[int, float]:
+    """Offset of `profile` against `template` and its correlation, in [-1, 1]."""
+    n = len(template)
+    best = (0, -1.0)
+    for shift in range(-max_shift, max_shift + 1):
+        a = profile[max(shift, 0) : n + min(shift, 0)]
+        b = template[max(-shift, 0) : n - max(shift, 0)]
+        score = float(np.dot(a, b)) / len(a)
+        if score > best[1]:
+            best = (shift, score)
+    return best
+
+
+@dataclass
+class GridTemplate:
+    """Table grid of a clean page, reused for the later pages of a PDF."""
+
+    shape: tuple[int, ...]
+    table_border: CellCoord
+    grid: CellGrid
+    col_profile: np.ndarray
+    row_profile: np.ndarray
+
+    @classmethod
+    def from_page(cls, page: Page) -> "GridTemplate":
+        col_profile, row_profile = ink_profiles(page.binary)
+        return cls(
+            shape=page.image.shape,
+            table_border=page.table_border,
+            grid=page.grid,
+            col_profile=col_profile,
+            row_profile=row_profile,
         )
 
-        reconstruct_missing_cells(page=page)
-        pages.append(page)
+    def register(self, bw: np.ndarray, dpi: int) -> tuple[CellCoord, CellGrid] | None:
+        """Grid of the binarized page `bw` as the template shifted onto it.
+
+        Returns None if the page does not correlate well enough with the
+        template, e.g. a different layout or a page with fewer rows.
+        """
+        if bw.shape != self.shape:
+            return None
+        with profiling.span("register"):
+            col_profile, row_profile = ink_profiles(bw)
+            max_shift = px(TEMPLATE_MAX_SHIFT, dpi)
+            dx, x_score = best_shift(col_profile, self.col_profile, max_shift)
+            dy, y_score = best_shift(row_profile, self.row_profile, max_shift)
+        confidence = min(x_score, y_score)
+        if confidence < TEMPLATE_MIN_CONFIDENCE:
+            logger.debug(f"Grid template rejected, confidence {confidence:.2f}")
+            return None
+
+        logger.debug(f"Grid template shifted by ({dx}, {dy}), {confidence:.2f}")
+        border = self.table_border
+        return (
+            CellCoord(border.x + dx, border.y + dy, border.w, border.h),
+            self.grid.shifted(dx, dy),
+        )
+
+
+def prepare_page(image: np.ndarray) -> np.ndarray:
+    """Rotated, contiguous grayscale copy of a rendered page.
 
+    This is the only copy made of a page, every later stage uses views of it.
+    """
+    with profiling.span("prepare"):
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return np.ascontiguousarray(rotate_image_90(image))
+
+
+def render_stage_key(pdf_digest: str, pagenum: int, dpi: int) -> str:
+    """Stage cache key of a page as rendered by `iter_pdf_images`."""
+    return stage_key("render", pdf_digest, pagenum, dpi, FIRST_PAGE_TABLE_PERC)
+
+
+def grid_params(options: ProcessOptions, dpi: int) -> dict[str, Any]:
+    """Every setting that changes the grid found on a page rendered at `dpi`.
+
+    Hashed into the grid stage cache keys and, with the settings of the
+    later stages, into `processing_fingerprint`. A constant added to grid
+    detection belongs here.
+    """
+    return {
+        "version": __version__,
+        "dpi": dpi,
+        "first_page_table": FIRST_PAGE_TABLE_PERC,
+        "detect_dpi": options.detect_dpi,
+        "detector": options.grid_detector,
+        "lines": [
+            LINE_SENSITIVITY,
+            CELL_MIN_W,
+            CELL_MIN_H,
+            PROJECTION_LINE_FILL,
+            PROJECTION_MAX_DRIFT,
+        ],
+        "cell_thresholds": [
+            CELL_ROW_Y_THRESHOLD,
+            CELL_ROW_X_THRESHOLD,
+            CELL_COLUMN_W_THRESHOLD,
+        ],
+        "columns": [COL_AVG_XS, COL_AVG_WIDTHS],
+        "template": [TEMPLATE_MAX_SHIFT, TEMPLATE_MIN_CONFIDENCE],
+    }
+
+
+def grid_stage_key(
+    render_key: str,
+    options: ProcessOptions,
+    dpi: int,
+    template: GridTemplate | None = None,
+) -> str:
+    """Stage cache key of the grid detected on the page of `render_key`."""
+    params: dict[str, Any] = {"grid": grid_params(options, dpi), "template": None}
+    if template is not None:
+        # Registered grids depend on the page the template was taken from.
+        params["template"] = [
+            list(template.table_border),
+            hashlib.sha256(template.grid.cells.tobytes()).hexdigest(),
+        ]
+    return stage_key("grid", render_key, params)
+
+
+def find_page_grid(
+    image: np.ndarray,
+    bw: np.ndarray,
+    options: ProcessOptions,
+    dpi: int,
+    template: GridTemplate | None,
+    label: str,
+) -> tuple[CellCoord, CellGrid, str]:
+    """Table border, grid and grid source of a prepared page, see `process_page`."""
+    if template is not None:
+        grid = template.register(bw, dpi)
+        if grid is not None:
+            return *grid, "template"
+    grid = scan_grid(
+        image,
+        dpi=dpi,
+        detect_dpi=options.detect_dpi,
+        detector=options.grid_detector,
+        bw=bw,
+    )
+    if grid is None and options.grid_detector != "morphology":
+        logger.warning(
+            f"{options.grid_detector} detector found no table in {label}, "
+            "falling back to morphology"
+        )
+        grid = scan_grid(image, dpi=dpi, detect_dpi=options.detect_dpi, bw=bw)
+    if grid is None:
+        raise ValueError(f"Failed to find table in {label}")
+    return *grid, "detected"
+
+
+def process_page(
+    pdf_name: str,
+    pagenum: int,
+    image: np.ndarray,
+    options: ProcessOptions | None = None,
+    dpi: int = RENDER_DPI,
+    template: GridTemplate | None = None,
+    pdf_path: Path | None = None,
+    stage_cache: StageCache | None = None,
+    render_key: str | None = None,
+) -> Page:
+    """Detect the table of a page rendered by `iter_pdf_images`.
+
+    With a `template`, the page is first registered against it and the full
+    detection only runs if that fails. With a `stage_cache` and the
+    `render_key` of the image, the grid found for the same image and grid
+    settings before is reused.
+    """
+    options = options or ProcessOptions()
+    image = prepare_page(image)
+    # Binarized once, for the grid and for the blank cell checks before OCR.
+    bw = preprocess(image)
+
+    grid_key = None
+    cached = None
+    if stage_cache is not None and render_key is not None:
+        grid_key = grid_stage_key(render_key, options, dpi, template)
+        cached = stage_cache.get_arrays(grid_key)
+    if cached is not None:
+        table_border = CellCoord(*cached["table_border"].tolist())
+        grid = CellGrid(cached["cells"], cached["reconstructed"])
+        grid_source = str(cached["grid_source"])
+        profiling.count("cached_grids")
+    else:
+        label = f"page {pagenum}, file: {pdf_name}"
+        table_border, grid, grid_source = find_page_grid(
+            image, bw, options, dpi, template, label
+        )
+        if stage_cache is not None and grid_key is not None:
+            stage_cache.put_arrays(
+                grid_key,
+                table_border=np.array(table_border, dtype=np.int32),
+                cells=grid.cells,
+                reconstructed=grid.reconstructed,
+                grid_source=np.array(grid_source),
+            )
+
+    profiling.count("cells", grid.n_rows * N_COLUMNS)
+    profiling.count("reconstructed_cells", int(grid.reconstructed.sum()))
+    for row_ndx in np.flatnonzero(grid.reconstructed.any(axis=1)):
+        logger.warning(
+            f"Page {pdf_name}, page {pagenum}, row {row_ndx}, "
+            f"reconstructed columns {np.flatnonzero(grid.reconstructed[row_ndx])}"
+        )
+    return Page(
+        pdf_name=pdf_name,
+        pagenum=pagenum,
+        image=image,
+        binary=bw,
+        table_border=table_border,
+        grid=grid,
+        dpi=dpi,
+        grid_source=grid_source,
+        pdf_path=pdf_path,
+    )
+
+
+def page_dpi(options: ProcessOptions) -> int:
+    """DPI the pages are rendered and processed at."""
+    return min(options.first_pass_dpi or RENDER_DPI, RENDER_DPI)
+
+
+def next_template(
+    page: Page, template: GridTemplate | None, options: ProcessOptions
+) -> GridTemplate | None:
+    """Grid template for the pages of a PDF after `page`."""
+    if not options.grid_template or page.grid.reconstructed.any():
+        return template
+    # The first page detected without any reconstruction sets the layout
+    # for the rest of the register. The first page is rendered cropped to
+    # its table, so a template made from it is replaced by the first clean
+    # full page.
+    if template is None or template.shape != page.image.shape:
+        return GridTemplate.from_page(page)
+    return template
+
+
+def iter_page_images(
+    pdf: Path,
+    dpi: int,
+    pagenums: list[int] | None = None,
+    stage_cache: StageCache | None = None,
+) -> Iterator[tuple[int, np.ndarray, str | None]]:
+    """Yield (pagenum, image, render key) for the pages of `pdf` in `pagenums`.
+
+    All pages by default. With a `stage_cache`, pages rendered before are
+    loaded memory-mapped from it instead of rendered again, and the others
+    are rendered and stored. The render key is None without a cache. A
+    cancelled run stops here between pages, see `progress`.
+    """
+    if stage_cache is None:
+        numbers: Iterable[int] = itertools.count() if pagenums is None else pagenums
+        images = iter_pdf_images(pdf, dpi=dpi, pages=pagenums)
+        for pagenum, image in zip(numbers, images):
+            progress.check_cancelled()
+            yield pagenum, image, None
+        return
+
+    if pagenums is None:
+        pagenums = list(range(pdf_page_count(pdf)))
+    digest = file_hash(pdf)
+    keys = {pagenum: render_stage_key(digest, pagenum, dpi) for pagenum in pagenums}
+    cached = {pagenum for pagenum in pagenums if stage_cache.contains(keys[pagenum])}
+    missing = [pagenum for pagenum in pagenums if pagenum not in cached]
+    rendered = iter_pdf_images(pdf, dpi=dpi, pages=missing) if missing else iter(())
+    for pagenum in pagenums:
+        progress.check_cancelled()
+        key = keys[pagenum]
+        image = stage_cache.get_array(key) if pagenum in cached else None
+        if image is None:
+            if pagenum in cached:
+                # Evicted since it was looked up.
+                image = next(iter_pdf_images(pdf, dpi=dpi, pages=[pagenum]))
+            else:
+                image = next(rendered)
+            stage_cache.put_array(key, image)
+        else:
+            profiling.count("cached_renders")
+        yield pagenum, image, key
+
+
+def iter_pages(
+    pdf: Path,
+    options: ProcessOptions | None = None,
+    skip_pages: Collection[int] = (),
+    stage_cache: StageCache | None = None,
+) -> Iterator[Page]:
+    """Yield the pages of `pdf` one at a time, rendering each on demand.
+
+    Pages numbered in `skip_pages` are not rendered. With a `stage_cache`,
+    rendered pages and detected grids are reused from earlier runs, see
+    `iter_page_images` and `process_page`.
+    """
+    options = options or ProcessOptions()
+    logging.info(f"Processing File: {pdf.name} - started")
+    template = None
+    dpi = page_dpi(options)
+    pagenums = None
+    if skip_pages:
+        pagenums = [n for n in range(pdf_page_count(pdf)) if n not in skip_pages]
+    for pagenum, image, render_key in iter_page_images(
+        pdf, dpi, pagenums, stage_cache
+    ):
+        with profiling.page_scope(pdf.name, pagenum):
+            page = process_page(
+                pdf_name=pdf.name,
+                pagenum=pagenum,
+                image=image,
+                options=options,
+                dpi=dpi,
+                template=template,
+                pdf_path=pdf,
+                stage_cache=stage_cache,
+                render_key=render_key,
+            )
+        template = next_template(page, template, options)
+        yield page
     logging.info(f"Processing File: {pdf.name} - completed")
-    return pages
 
 
 @dataclass
@@ -286,30 +1011,506 @@ class ResultRecord:
     note: float | None = None
     page: int = -1
     pdf: str = ""
+    # DPI the text fields were read at, RENDER_DPI if any was OCR'd again.
+    ocr_dpi: int | None = None
+
+
+OCR_LANG = "bul"
+OCR_MODES = ("cell", "column", "page")
+OCR_MOSAIC_GAP = 40
+# A text cell is blank unless it holds a blob of at least this many ink
+# pixels, at REFERENCE_DPI, that is not a sliver of a table line.
+BLANK_CELL_MIN_INK = 20
+BLANK_CELL_LINE_THICKNESS = 6
+
+DIGIT_READERS = ("tesseract", "templates")
+DIGITS_WHITELIST = "-c tessedit_char_whitelist=0123456789"
+# One line of digits per cell, a block of lines for mosaics.
+DIGITS_CONFIG = f"--psm 7 {DIGITS_WHITELIST}"
+DIGITS_MOSAIC_CONFIG = f"--psm 6 {DIGITS_WHITELIST}"
+# Template reads of a cell below this match score, or with a digit that
+# matches the runner-up digit almost as well, go to tesseract instead.
+DIGIT_MIN_SCORE = 0.7
+DIGIT_MIN_MARGIN = 0.08
+# Only EGNs are read by the digit templates, their checksum catches most
+# misread digits. Record numbers have nothing to check them against, and
+# the templates confuse digits like 6 and 5 consistently in some fonts.
+TEMPLATE_DIGIT_COLUMNS = {COLUMN_EGN}
+DIGIT_MIN_HEIGHT = 15
+EGN_WEIGHTS = (2, 4, 8, 5, 10, 9, 7, 3, 6)
+# Lowest tesseract word confidence (0-100) accepted from a first pass at
+# ProcessOptions.first_pass_dpi.
+OCR_MIN_CONF = 70
+# Margin around the cells rendered again for a second pass.
+OCR_REGION_MARGIN = 10
+
+CellKey: TypeAlias = tuple[int, int]
+
+
+def padded_boxes(
+    grid: CellGrid, columns: set[int], padding: int
+) -> tuple[list[CellKey], np.ndarray]:
+    """(row, col) keys and inset (x, y, w, h) rows of the `columns` cells."""
+    cols = sorted(columns)
+    boxes = grid.cells[:, cols] + np.array(
+        [padding, padding, -2 * padding, -2 * padding], dtype=np.int32
+    )
+    keys = [(row_ndx, col_ndx) for row_ndx in range(grid.n_rows) for col_ndx in cols]
+    return keys, boxes.reshape(-1, 4)
 
 
-def process_ocr(page: Page) -> list[ResultRecord]:
-    img_arr: np.ndarray = np.array(page.image)
-    records = []
+def text_cells(
+    grid: CellGrid, dpi: int = REFERENCE_DPI, columns: set[int] = TEXT_COLUMNS
+) -> dict[CellKey, CellCoord]:
+    """Padded OCR boxes of the `columns` cells, keyed by (row, col)."""
+    keys, boxes = padded_boxes(grid, columns, px(TEXT_CELL_PADDING, dpi))
+    return {key: CellCoord(*box) for key, box in zip(keys, boxes.tolist())}
 
-    for _, row in enumerate(page.rows):
-        record = ResultRecord(pdf=page.pdf_name, page=page.pagenum)
-        for col_ndx, cell in enumerate(row):
-            if col_ndx in TEXT_COLUMNS:
-                x, y, w, h = (
-                    cell.x + TEXT_CELL_PADDING,
-                    cell.y + TEXT_CELL_PADDING,
-                    cell.w - 2 * TEXT_CELL_PADDING,
-                    cell.h - 2 * TEXT_CELL_PADDING,
+
+def build_cell_mosaic(
+    img_arr: np.ndarray, layout: list[list[tuple[CellKey, CellCoord]]]
+) -> tuple[np.ndarray, dict[CellKey, CellCoord]]:
+    """Paste cell crops onto one white canvas.
+
+    Each entry of `layout` is a line of cells placed left to right; lines are
+    stacked top to bottom and the n-th cell of every line shares a column.
+    Returns the canvas and the box each cell occupies on it.
+    """
+    n_cols = max((len(line) for line in layout), default=0)
+    col_widths = [0] * n_cols
+    line_heights = []
+    for line in layout:
+        for n, (_, box) in enumerate(line):
+            col_widths[n] = max(col_widths[n], box.w)
+        line_heights.append(max((box.h for _, box in line), default=0))
+
+    col_xs = []
+    x = OCR_MOSAIC_GAP
+    for w in col_widths:
+        col_xs.append(x)
+        x += w + OCR_MOSAIC_GAP
+    canvas_w = x
+    canvas_h = sum(line_heights) + OCR_MOSAIC_GAP * (len(layout) + 1)
+
+    canvas = np.full((canvas_h, canvas_w, *img_arr.shape[2:]), 255, img_arr.dtype)
+    placed = {}
+    y = OCR_MOSAIC_GAP
+    for line, line_h in zip(layout, line_heights):
+        for n, (key, box) in enumerate(line):
+            crop = img_arr[box.y : box.y + box.h, box.x : box.x + box.w]
+            h, w = crop.shape[:2]
+            canvas[y : y + h, col_xs[n] : col_xs[n] + w] = crop
+            placed[key] = CellCoord(col_xs[n], y, w, h)
+        y += line_h + OCR_MOSAIC_GAP
+    return canvas, placed
+
+
+def ocr_mosaic(
+    backend: OcrBackend,
+    canvas: np.ndarray,
+    placed: dict[CellKey, CellCoord],
+    config: str = "",
+    min_conf: float | None = None,
+) -> dict[CellKey, str]:
+    """OCR a cell mosaic once and map the words back to their cells.
+
+    With `min_conf`, cells with a word below that tesseract confidence, or
+    without any words, are left out of the result.
+    """
+    data = backend.image_to_data(canvas, config=config)
+    lines: dict[CellKey, dict[tuple[int, int, int], list[str]]] = {}
+    confs: dict[CellKey, float] = {}
+    for n, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word:
+            continue
+        cx = data["left"][n] + data["width"][n] // 2
+        cy = data["top"][n] + data["height"][n] // 2
+        for key, box in placed.items():
+            if box.x <= cx < box.x + box.w and box.y <= cy < box.y + box.h:
+                line = (data["block_num"][n], data["par_num"][n], data["line_num"][n])
+                lines.setdefault(key, {}).setdefault(line, []).append(word)
+                confs[key] = min(confs.get(key, 100.0), float(data["conf"][n]))
+                break
+
+    return {
+        key: "\n".join(" ".join(words) for words in lines.get(key, {}).values())
+        for key in placed
+        if min_conf is None or confs.get(key, -1) >= min_conf
+    }
+
+
+def map_threads(func: Callable[[Any], Any], items: list, threads: int = 1) -> list:
+    """`map` on up to `threads` threads, results in the order of `items`.
+
+    Every OCR call goes through here, so a cancelled run stops before the
+    next one with `progress.Cancelled`.
+    """
+
+    def call(item: Any) -> Any:
+        progress.check_cancelled()
+        return func(item)
+
+    if threads <= 1 or len(items) <= 1:
+        return list(map(call, items))
+    with ThreadPoolExecutor(max_workers=min(threads, len(items))) as pool:
+        return list(pool.map(call, items))
+
+
+def is_blank_cell(bw: np.ndarray, dpi: int = REFERENCE_DPI) -> bool:
+    """Whether a binarized cell crop holds no text worth sending to OCR.
+
+    Specks smaller than BLANK_CELL_MIN_INK and thin strips spanning half the
+    crop, left over from the table lines, do not count as text.
+    """
+    min_ink = BLANK_CELL_MIN_INK * (dpi / REFERENCE_DPI) ** 2
+    if cv2.countNonZero(bw) < min_ink:
+        return True
+    _, _, stats, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    w = stats[1:, cv2.CC_STAT_WIDTH]
+    h = stats[1:, cv2.CC_STAT_HEIGHT]
+    thickness = px(BLANK_CELL_LINE_THICKNESS, dpi)
+    line = ((h <= thickness) & (w * 2 >= bw.shape[1])) | (
+        (w <= thickness) & (h * 2 >= bw.shape[0])
+    )
+    return not np.any((stats[1:, cv2.CC_STAT_AREA] >= min_ink) & ~line)
+
+
+def blank_text_cells(
+    bw: np.ndarray, boxes: dict[CellKey, CellCoord], dpi: int = REFERENCE_DPI
+) -> set[CellKey]:
+    """Keys of the `boxes` that are blank in the binarized page `bw`."""
+    return {
+        key
+        for key, box in boxes.items()
+        if is_blank_cell(bw[box.y : box.y + box.h, box.x : box.x + box.w], dpi)
+    }
+
+
+def ocr_text_cells(
+    img_arr: np.ndarray,
+    grid: CellGrid,
+    backend: OcrBackend,
+    ocr_mode: str = "cell",
+    dpi: int = REFERENCE_DPI,
+    threads: int = 1,
+    skip: Collection[CellKey] = (),
+    columns: set[int] = TEXT_COLUMNS,
+    config: str = "",
+    min_conf: float | None = None,
+) -> dict[CellKey, str]:
+    """OCR the `columns` cells of a page with the tesseract `config`.
+
+    - "cell": one tesseract call per cell.
+    - "column": the cells of each text column are stacked into one image.
+    - "page": all text cells of the page are laid out into one image.
+
+    Up to `threads` tesseract calls run at the same time. The cells in `skip`
+    are not OCR'd and come back as empty text. With `min_conf`, cells read
+    with lower confidence are missing from the result, see `ocr_mosaic`.
+    """
+    boxes = {
+        key: box
+        for key, box in text_cells(grid, dpi, columns).items()
+        if key not in skip
+    }
+    texts = {key: "" for key in skip if key[1] in columns}
+    if ocr_mode == "cell":
+
+        def ocr_cell(box: CellCoord) -> str | None:
+            crop = img_arr[box.y : box.y + box.h, box.x : box.x + box.w]
+            if min_conf is None:
+                return backend.image_to_string(crop, config=config).strip()
+            whole = {(0, 0): CellCoord(0, 0, box.w, box.h)}
+            return ocr_mosaic(backend, crop, whole, config, min_conf).get((0, 0))
+
+        profiling.count("ocr_calls", len(boxes))
+        cell_texts = map_threads(ocr_cell, list(boxes.values()), threads)
+        texts.update(
+            (key, text) for key, text in zip(boxes, cell_texts) if text is not None
+        )
+        return texts
+
+    if ocr_mode == "column":
+        layouts = [
+            [[(key, box)] for key, box in boxes.items() if key[1] == col_ndx]
+            for col_ndx in sorted(columns)
+        ]
+    elif ocr_mode == "page":
+        layouts = [
+            [
+                [(key, box) for key, box in boxes.items() if key[0] == row_ndx]
+                for row_ndx in range(grid.n_rows)
+            ]
+        ]
+    else:
+        raise ValueError(f"Unknown OCR mode {ocr_mode!r}, expected one of {OCR_MODES}")
+
+    def ocr_layout(layout: list[list[tuple[CellKey, CellCoord]]]):
+        canvas, placed = build_cell_mosaic(img_arr, layout)
+        return ocr_mosaic(backend, canvas, placed, config, min_conf)
+
+    layouts = [[line for line in layout if line] for layout in layouts]
+    layouts = [layout for layout in layouts if layout]
+    profiling.count("ocr_calls", len(layouts))
+    for layout_texts in map_threads(ocr_layout, layouts, threads):
+        texts.update(layout_texts)
+    return texts
+
+
+def is_valid_egn(egn: str) -> bool:
+    """Check the birth date and the checksum digit of a Bulgarian EGN."""
+    if len(egn) != 10 or not egn.isdigit():
+        return False
+    # Months are offset by 20 for births in the 1800s and by 40 in the 2000s.
+    month = int(egn[2:4])
+    century = {0: 1900, 1: 1800, 2: 2000}.get(month // 20)
+    if century is None:
+        return False
+    try:
+        datetime(century + int(egn[:2]), month % 20, int(egn[4:6]))
+    except ValueError:
+        return False
+    checksum = sum(int(d) * w for d, w in zip(egn, EGN_WEIGHTS)) % 11 % 10
+    return checksum == int(egn[9])
+
+
+def is_valid_number(col_ndx: int, digits: str) -> bool:
+    """Whether `digits` read from a NUMBER_COLUMNS cell are plausible."""
+    if col_ndx == COLUMN_EGN:
+        return is_valid_egn(digits)
+    return digits.isdigit()
+
+
+def read_digit_cells(
+    bw: np.ndarray, boxes: dict[CellKey, CellCoord], dpi: int = REFERENCE_DPI
+) -> dict[CellKey, str]:
+    """Digits of the TEMPLATE_DIGIT_COLUMNS cells read reliably by templates.
+
+    Cells that match the templates poorly or ambiguously, or fail
+    `is_valid_number`, are left out, to be read by tesseract.
+    """
+    model = get_digit_model()
+    min_height = px(DIGIT_MIN_HEIGHT, dpi)
+    max_stroke = px(BLANK_CELL_LINE_THICKNESS, dpi)
+    texts = {}
+    for key, box in boxes.items():
+        crop = bw[box.y : box.y + box.h, box.x : box.x + box.w]
+        glyphs = segment_digits(crop, min_height, max_stroke)
+        digits, score, margin = model.classify(glyphs)
+        if (
+            score >= DIGIT_MIN_SCORE
+            and margin >= DIGIT_MIN_MARGIN
+            and is_valid_number(key[1], digits)
+        ):
+            texts[key] = digits
+    return texts
+
+
+def render_page_box(page: Page, box: CellCoord, dpi: int) -> np.ndarray:
+    """Render `box` of `page.image` again at `dpi`, prepared like the page.
+
+    The result covers `box` scaled from `page.dpi` to `dpi`.
+    """
+    assert page.pdf_path is not None
+    target = scale_cell(box, dpi / page.dpi)
+    page_h = round(page.image.shape[0] * dpi / page.dpi)
+    # `prepare_page` rotates counterclockwise, so the rows of the page image
+    # are the columns of the rendered page, counted from its right edge.
+    region = CellCoord(page_h - target.y - target.h, target.x, target.h, target.w)
+    pagenum = page.pagenum + 1
+    (image,) = render_pages(page.pdf_path, pagenum, pagenum, dpi=dpi, region=region)
+    return prepare_page(image)
+
+
+def reocr_cells(
+    page: Page,
+    keys: list[CellKey],
+    backend: OcrBackend,
+    dpi: int = RENDER_DPI,
+    threads: int = 1,
+) -> dict[CellKey, str]:
+    """OCR text cells again from one render of the region around them."""
+    boxes = text_cells(page.grid, page.dpi)
+    margin = px(OCR_REGION_MARGIN, page.dpi)
+    cells = np.array([boxes[key] for key in keys])
+    x0, y0 = np.maximum(cells[:, :2].min(axis=0) - margin, 0)
+    x1 = min((cells[:, 0] + cells[:, 2]).max() + margin, page.image.shape[1])
+    y1 = min((cells[:, 1] + cells[:, 3]).max() + margin, page.image.shape[0])
+    image = render_page_box(page, CellCoord(x0, y0, x1 - x0, y1 - y0), dpi)
+
+    def ocr_cell(key: CellKey) -> str:
+        box = boxes[key]
+        box = scale_cell(
+            CellCoord(box.x - x0, box.y - y0, box.w, box.h), dpi / page.dpi
+        )
+        config = DIGITS_CONFIG if key[1] in NUMBER_COLUMNS else ""
+        crop = image[box.y : box.y + box.h, box.x : box.x + box.w]
+        return backend.image_to_string(crop, config=config).strip()
+
+    profiling.count("ocr_calls", len(keys))
+    with profiling.span("reocr"):
+        return dict(zip(keys, map_threads(ocr_cell, keys, threads)))
+
+
+# Object array, so the scores stay plain ints/floats in the report.
+INK_LEVELS = np.array([0, 0.3, 0.6, 1], dtype=object)
+
+
+def ink_integral(gray: np.ndarray) -> np.ndarray:
+    """Summed-area table of the ink pixels (darker than 200) of a page."""
+    _, ink = cv2.threshold(gray, 200, 1, cv2.THRESH_BINARY_INV)
+    return cv2.integral(ink)
+
+
+def count_ink(integral: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """Ink pixel count of each (x, y, w, h) row of `boxes`."""
+    height, width = integral.shape[0] - 1, integral.shape[1] - 1
+    x0 = np.clip(boxes[:, 0], 0, width)
+    y0 = np.clip(boxes[:, 1], 0, height)
+    x1 = np.clip(boxes[:, 0] + boxes[:, 2], x0, width)
+    y1 = np.clip(boxes[:, 1] + boxes[:, 3], y0, height)
+    return integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+
+
+def ink_confidence(ink_pixels: np.ndarray, dpi: int = REFERENCE_DPI) -> np.ndarray:
+    """Map ink pixel counts to the `INC_THRESHOLD_*` confidence bands."""
+    # The thresholds are areas, so they scale with the square of the DPI.
+    bands = np.array([INC_THRESHOLD_MIN, INC_THRESHOLD_MID, INC_THRESHOLD_MAX])
+    bands = bands * (dpi / REFERENCE_DPI) ** 2
+    return INK_LEVELS[np.searchsorted(bands, ink_pixels, side="left")]
+
+
+def score_signature_cells(
+    gray: np.ndarray, grid: CellGrid, dpi: int = REFERENCE_DPI
+) -> dict[CellKey, float]:
+    """Ink confidence of every `SIGNATURE_COLUMNS` cell, keyed by (row, col)."""
+    keys, box_arr = padded_boxes(
+        grid, SIGNATURE_COLUMNS, px(SIGNATURE_CELL_PADDING, dpi)
+    )
+    if not keys:
+        return {}
+
+    # Only the region spanned by the signature columns is binarized.
+    x0, y0 = np.maximum(box_arr[:, :2].min(axis=0), 0)
+    x1 = (box_arr[:, 0] + box_arr[:, 2]).max()
+    y1 = (box_arr[:, 1] + box_arr[:, 3]).max()
+    box_arr[:, 0] -= x0
+    box_arr[:, 1] -= y0
+    ink_pixels = count_ink(ink_integral(gray[y0:y1, x0:x1]), box_arr)
+    return dict(zip(keys, ink_confidence(ink_pixels, dpi).tolist()))
+
+
+def process_ocr(
+    page: Page, options: ProcessOptions | None = None
+) -> list[ResultRecord]:
+    options = options or ProcessOptions()
+    backend = get_ocr_backend(options.ocr_backend, lang=OCR_LANG)
+    blank: set[CellKey] = set()
+    if options.skip_blank_cells:
+        with profiling.span("blank_cells"):
+            blank = blank_text_cells(
+                page.binary, text_cells(page.grid, page.dpi), page.dpi
+            )
+    page.blank_cells = len(blank)
+    profiling.count("blank_cells", len(blank))
+
+    # Number cells already known, blank or read by the digit templates.
+    numbers = {key: "" for key in blank if key[1] in NUMBER_COLUMNS}
+    if options.digit_reader == "templates":
+        boxes = text_cells(page.grid, page.dpi, TEMPLATE_DIGIT_COLUMNS)
+        boxes = {key: box for key, box in boxes.items() if key not in numbers}
+        with profiling.span("digits"):
+            read = read_digit_cells(page.binary, boxes, page.dpi)
+        numbers.update(read)
+        logger.debug(
+            f"Page {page.pagenum}: {len(read)}/{len(boxes)} EGN cells read "
+            "by the digit templates"
+        )
+    elif options.digit_reader != "tesseract":
+        raise ValueError(
+            f"Unknown digit reader {options.digit_reader!r}, "
+            f"expected one of {DIGIT_READERS}"
+        )
+
+    # Below RENDER_DPI this is a first pass, doubtful cells are read again.
+    min_conf = OCR_MIN_CONF if page.dpi < RENDER_DPI else None
+    ocr = partial(
+        ocr_text_cells,
+        page.image,
+        page.grid,
+        backend,
+        ocr_mode=options.ocr_mode,
+        dpi=page.dpi,
+        threads=options.ocr_threads,
+        min_conf=min_conf,
+    )
+    digits_config = DIGITS_MOSAIC_CONFIG
+    if options.ocr_mode == "cell":
+        digits_config = DIGITS_CONFIG
+    texts: dict[CellKey, str] = {}
+    if options.ocr_mode == "page":
+        # One mosaic holds every column, its time can't be split by column.
+        with profiling.span("ocr_text"):
+            texts = ocr(skip=blank, columns=TEXT_COLUMNS - NUMBER_COLUMNS)
+        with profiling.span("ocr_numbers"):
+            texts.update(
+                ocr(skip=numbers, columns=NUMBER_COLUMNS, config=digits_config)
+            )
+    else:
+        for col_ndx in sorted(TEXT_COLUMNS):
+            is_number = col_ndx in NUMBER_COLUMNS
+            with profiling.span(f"ocr_col_{col_ndx}"):
+                texts.update(
+                    ocr(
+                        skip=numbers if is_number else blank,
+                        columns={col_ndx},
+                        config=digits_config if is_number else "",
+                    )
                 )
-                cell_arr = img_arr[y : y + h, x : x + w]
-                cell_img = Image.fromarray(cell_arr)
+    texts.update(numbers)
+
+    reread: list[CellKey] = []
+    if min_conf is not None:
+        reread = [
+            key
+            for key in text_cells(page.grid, page.dpi)
+            if key not in texts
+            or (
+                key[1] in NUMBER_COLUMNS
+                and key not in numbers
+                and not is_valid_number(key[1], re.sub(r"\D", "", texts[key]))
+            )
+        ]
+    if reread and page.pdf_path is None:
+        logger.warning(f"Page {page.pagenum}: no PDF to read doubtful cells again")
+        reread = []
+    if reread:
+        logger.debug(
+            f"Page {page.pagenum}: {len(reread)} text cells OCR'd again "
+            f"at {RENDER_DPI} DPI"
+        )
+        texts.update(
+            reocr_cells(page, reread, backend, RENDER_DPI, options.ocr_threads)
+        )
+    reread_rows = {row_ndx for row_ndx, _ in reread}
+    with profiling.span("ink_scoring"):
+        ink_scores = score_signature_cells(page.image, page.grid, dpi=page.dpi)
+    records = []
 
-                text = pytesseract.image_to_string(cell_img, lang="bul").strip()
+    for row_ndx in range(page.grid.n_rows):
+        record = ResultRecord(
+            pdf=page.pdf_name,
+            page=page.pagenum,
+            ocr_dpi=RENDER_DPI if row_ndx in reread_rows else page.dpi,
+        )
+        for col_ndx in range(N_COLUMNS):
+            if col_ndx in TEXT_COLUMNS:
+                text = texts[(row_ndx, col_ndx)]
 
-                if col_ndx in {COLUMN_RECORD_NUM, COLUMN_EGN}:
-                    m = re.search(r"\b\d+\b", text)
-                    number = int(m.group(0)) if m else None
+                if col_ndx in NUMBER_COLUMNS:
+                    digits = re.sub(r"\D", "", text)
+                    number = int(digits) if digits else None
                     if col_ndx == COLUMN_RECORD_NUM:
                         record.number = number
                     if col_ndx == COLUMN_EGN:
@@ -320,23 +1521,7 @@ def process_ocr(page: Page) -> list[ResultRecord]:
                     record.address = text
 
             elif col_ndx in SIGNATURE_COLUMNS:
-                x, y, w, h = (
-                    cell.x + SIGNATURE_CELL_PADDING,
-                    cell.y + SIGNATURE_CELL_PADDING,
-                    cell.w - 2 * SIGNATURE_CELL_PADDING,
-                    cell.h - 2 * SIGNATURE_CELL_PADDING,
-                )
-                cell_arr = img_arr[y : y + h, x : x + w]
-                gray = cv2.cvtColor(cell_arr, cv2.COLOR_BGR2GRAY)
-                _, thresh = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
-                ink_pixels = cv2.countNonZero(thresh)
-                confidence: float = 0
-                if INC_THRESHOLD_MAX < ink_pixels:
-                    confidence = 1
-                elif INC_THRESHOLD_MID < ink_pixels:
-                    confidence = 0.6
-                elif INC_THRESHOLD_MIN < ink_pixels:
-                    confidence = 0.3
+                confidence = ink_scores[(row_ndx, col_ndx)]
                 if col_ndx == COLUMN_DATE:
                     record.date = confidence
                 elif col_ndx == COLUMN_SIGNATURE:
@@ -348,71 +1533,956 @@ def process_ocr(page: Page) -> list[ResultRecord]:
     return records
 
 
-def write_records_csv(records: list[ResultRecord], out_path: str):
-    """Write a list of ResultRecord dataclass instances to a CSV file.
+OVERLAY_DPI = 100
+OVERLAY_JPEG_QUALITY = 80
+# Ink scores between the lowest and the highest band, neither clearly empty
+# nor clearly signed.
+DOUBTFUL_INK = set(INK_LEVELS[1:-1].tolist())
+INK_FIELDS = {"date": COLUMN_DATE, "signature": COLUMN_SIGNATURE, "note": COLUMN_NOTE}
+
+
+def doubtful_cells(records: list[ResultRecord]) -> set[CellKey]:
+    """Cells of fields read with low confidence: mid-band ink or a bad EGN."""
+    cells = set()
+    for row_ndx, record in enumerate(records):
+        for field_name, col_ndx in INK_FIELDS.items():
+            if getattr(record, field_name) in DOUBTFUL_INK:
+                cells.add((row_ndx, col_ndx))
+        if record.egn is not None and not is_valid_egn(f"{record.egn:010d}"):
+            cells.add((row_ndx, COLUMN_EGN))
+    return cells
+
+
+def box_outlines(boxes: np.ndarray) -> list[np.ndarray]:
+    """Corner points of (x, y, w, h) boxes, for `cv2.polylines`."""
+    x, y, w, h = boxes.reshape(-1, 4).T
+    corners = np.stack([x, y, x + w, y, x + w, y + h, x, y + h], axis=1)
+    return list(corners.reshape(-1, 4, 2))
 
-    - `records` may be empty; a CSV with only headers will be created.
-    - `out_path` can be a `str` or `pathlib.Path`.
+
+def draw_overlay(
+    page: Page, records: list[ResultRecord], dpi: int = OVERLAY_DPI
+) -> np.ndarray:
+    """RGB preview of the page with its grid and ink scores drawn on it.
+
+    Everything is drawn in one pass on a single copy of the page, downscaled
+    to `dpi` first: detected cells in green, reconstructed ones in red, the
+    table border in blue and the cells of `doubtful_cells` in orange.
     """
-    field_names = [f.name for f in fields(ResultRecord)]
-    with open(out_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=field_names, delimiter=";", quoting=csv.QUOTE_MINIMAL)
-        writer.writeheader()
-        for r in records:
-            row = asdict(r)
-            writer.writerow(row)
-    logger.debug(f"Finished writing {out_path}")
+    scale = min(dpi / page.dpi, 1)
+    small = cv2.resize(
+        page.image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+    )
+    canvas = cv2.cvtColor(small, cv2.COLOR_GRAY2RGB)
+    cells = np.rint(page.grid.cells * scale).astype(np.int32)
+    doubtful = np.zeros(page.grid.reconstructed.shape, dtype=bool)
+    for row_ndx, col_ndx in doubtful_cells(records):
+        doubtful[row_ndx, col_ndx] = True
+    reconstructed = page.grid.reconstructed & ~doubtful
+    detected = ~(page.grid.reconstructed | doubtful)
+
+    for mask, color, thickness in (
+        (detected, GREEN, 1),
+        (reconstructed, RED, 2),
+        (doubtful, ORANGE, 2),
+    ):
+        if mask.any():
+            cv2.polylines(canvas, box_outlines(cells[mask]), True, color, thickness)
+    border = np.rint(np.array(page.table_border) * scale).astype(np.int32)
+    cv2.polylines(canvas, box_outlines(border), True, BLUE, 2)
+
+    for row_ndx, record in enumerate(records):
+        for field_name, col_ndx in INK_FIELDS.items():
+            value = getattr(record, field_name)
+            if value is None:
+                continue
+            x, y, _, h = cells[row_ndx, col_ndx].tolist()
+            color = ORANGE if doubtful[row_ndx, col_ndx] else BLUE
+            cv2.putText(
+                canvas,
+                f"{value:g}",
+                (x + 3, y + h - 4),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.4,
+                color,
+                1,
+                cv2.LINE_AA,
+            )
+    return canvas
+
+
+def write_overlay(page: Page, records: list[ResultRecord], folder: str | Path):
+    """Save the `draw_overlay` preview of a page QA should check.
+
+    Only pages with reconstructed cells or `doubtful_cells` get one.
+    """
+    if not page.grid.reconstructed.any() and not doubtful_cells(records):
+        return
+    with profiling.span("overlay"):
+        canvas = draw_overlay(page, records)
+        name = f"{Path(page.pdf_name).stem}_page{page.pagenum + 1:03d}.jpg"
+        path = Path(folder) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(canvas).save(path, "JPEG", quality=OVERLAY_JPEG_QUALITY)
+    profiling.count("overlays")
+
+
+@dataclass
+class PdfResult:
+    pdf_name: str
+    records: list[ResultRecord] = field(default_factory=list)
+    reconstructed: dict[str, dict[tuple[int, int], CellCoord]] = field(
+        default_factory=dict
+    )
+    blank_cells: int = 0
+
+    def renamed(self, pdf_name: str) -> "PdfResult":
+        """Copy of the result attributed to a PDF with the same content."""
+        if pdf_name == self.pdf_name:
+            return self
+        records = [replace(record, pdf=pdf_name) for record in self.records]
+        reconstructed = {
+            f"{pdf_name}:{key.rpartition(':')[2]}": cells
+            for key, cells in self.reconstructed.items()
+        }
+        return PdfResult(pdf_name, records, reconstructed, self.blank_cells)
+
+    def extend(self, other: "PdfResult"):
+        """Append the results of later pages of the same PDF."""
+        self.records.extend(other.records)
+        self.reconstructed.update(other.reconstructed)
+        self.blank_cells += other.blank_cells
+
+
+def processing_fingerprint(options: ProcessOptions) -> str:
+    """Hash of every setting that changes the records produced for a PDF.
+
+    It decides whether cached results are reused and whether a report can
+    be resumed, so a constant added to any processing stage belongs here,
+    or in `grid_params` for grid detection.
+    """
+    params = {
+        "grid": grid_params(options, page_dpi(options)),
+        "render_dpi": RENDER_DPI,
+        "cell_padding": [SIGNATURE_CELL_PADDING, TEXT_CELL_PADDING],
+        "ink_thresholds": [INC_THRESHOLD_MIN, INC_THRESHOLD_MID, INC_THRESHOLD_MAX],
+        "ink_levels": INK_LEVELS.tolist(),
+        "blank_cells": [BLANK_CELL_MIN_INK, BLANK_CELL_LINE_THICKNESS],
+        "ocr_lang": OCR_LANG,
+        "ocr": [
+            OCR_MOSAIC_GAP,
+            DIGITS_CONFIG,
+            DIGITS_MOSAIC_CONFIG,
+            OCR_MIN_CONF,
+            OCR_REGION_MARGIN,
+        ],
+        "options": {
+            key: value
+            for key, value in asdict(replace(options, ocr_threads=1)).items()
+            if key != "overlay_dir"
+        },
+    }
+    if options.digit_reader == "templates":
+        params["digit_templates"] = [
+            DIGIT_MIN_SCORE,
+            DIGIT_MIN_MARGIN,
+            DIGIT_MIN_HEIGHT,
+            sorted(TEMPLATE_DIGIT_COLUMNS),
+        ]
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def result_cache_key(pdf: Path, fingerprint: str) -> str:
+    return hashlib.sha256(f"{file_hash(pdf)}:{fingerprint}".encode()).hexdigest()
+
+
+def iter_page_records(
+    pdf: Path,
+    options: ProcessOptions | None = None,
+    page_callback: Callable[[int, int], None] | None = None,
+    skip_pages: Collection[int] = (),
+    stage_cache: StageCache | None = None,
+) -> Iterator[tuple[int, PdfResult]]:
+    """Run grid detection and OCR for the pages of `pdf`, one at a time.
+
+    Yields (pagenum, result) for every page not in `skip_pages`.
+    `page_callback` is called with (pagenum, n_pages) before each page is
+    OCR'd. `stage_cache` is passed on to `iter_pages`.
+    """
+    options = options or ProcessOptions()
+    n_pages = pdf_page_count(pdf)
+
+    # Pages are rendered, analyzed and released one at a time.
+    for page in iter_pages(pdf, options, skip_pages, stage_cache):
+        if page_callback is not None:
+            page_callback(page.pagenum, n_pages)
+        yield page.pagenum, process_page_records(page, options)
+
+
+# Queue the pool workers send their pages to, see `init_worker`.
+_page_queue: Any = None
+
+
+def init_worker(cancel_event: Any, page_queue: Any):
+    """Pool worker initializer, with the run's cancel event and page queue."""
+    global _page_queue
+    progress.install(cancel_event)
+    _page_queue = page_queue
+
+
+def send_pdf_records(
+    n: int,
+    pdf: Path,
+    options: ProcessOptions | None = None,
+    skip_pages: Collection[int] = (),
+    stage_cache: StageCache | None = None,
+    profiled: bool = False,
+) -> Profile | None:
+    """Send the records of every page of `pdf` not in `skip_pages`.
+
+    This is the unit of work handed to the process pool in `process_folder`.
+    Each page goes to the worker's page queue as (n, pagenum, n_pages,
+    result) once it is OCR'd, so the parent can write it to the report,
+    and (n, None, n_pages, None) follows the last one. With `profiled`, the
+    profile of the run is returned.
+    """
+    n_pages = 0
+
+    def count_pages(_: int, pages: int):
+        nonlocal n_pages
+        n_pages = pages
+
+    profiler = Profiler() if profiled else None
+    with profiling.activate(profiler):
+        for pagenum, result in iter_page_records(
+            pdf, options, count_pages, skip_pages, stage_cache
+        ):
+            _page_queue.put((n, pagenum, n_pages, result))
+    _page_queue.put((n, None, n_pages, None))
+    return None if profiler is None else profiler.profile
+
+
+def process_page_records(page: Page, options: ProcessOptions) -> PdfResult:
+    """OCR one page, as a result to `PdfResult.extend` the PDF's result with."""
+    with profiling.page_scope(page.pdf_name, page.pagenum):
+        records = process_ocr(page=page, options=options)
+        profiling.count("records", len(records))
+        profiling.count("pages")
+        if options.overlay_dir is not None:
+            write_overlay(page, records, options.overlay_dir)
+    result = PdfResult(page.pdf_name, records, blank_cells=page.blank_cells)
+    if page.reconstructed:
+        result.reconstructed[f"{page.pdf_name}:{page.pagenum}"] = page.reconstructed
+    return result
+
+
+@dataclass
+class PipelineConfig:
+    """Threads of each `run_pipeline` stage and the queue size between them."""
+
+    render_workers: int = 1
+    detect_workers: int = 1
+    ocr_workers: int = 2
+    # Items waiting between two stages, this bounds the pages in memory.
+    queue_size: int = 4
+
+
+class PipelineStopped(Exception):
+    """Raised in pipeline threads to unwind after another stage failed."""
+
+
+def run_pipeline(
+    pdfs: list[Path],
+    options: ProcessOptions,
+    config: PipelineConfig,
+    on_result: Callable[[int, PdfResult], None],
+    on_page: Callable[[int, int, int, PdfResult], None] | None = None,
+    skip_pages: list[Collection[int]] | None = None,
+    stage_cache: StageCache | None = None,
+):
+    """Process `pdfs` with page rendering, grid detection and OCR overlapping.
+
+    Each stage runs on its own threads and hands its output to the next
+    through a bounded queue, so a stage that falls behind blocks the ones
+    before it instead of letting pages pile up. pdftoppm, OpenCV and
+    tesseract all release the GIL while they work.
+
+    Pages finish in any order but are handed out in order: `on_page` is
+    called with (index, pagenum, n_pages, result) for every page, and
+    `on_result` with (index, result) for every PDF, in the order of `pdfs`.
+    Both run on the calling thread. Pages numbered in `skip_pages[index]`
+    are not processed. The first exception in any stage stops the pipeline
+    and is raised here. `stage_cache` is used as in `iter_pages`.
+    """
+    if not pdfs:
+        return
+    dpi = page_dpi(options)
+    detect_workers = config.detect_workers
+    if options.grid_template and detect_workers > 1:
+        # Templates are built from the pages of a PDF in order.
+        logger.info("Grid templates need pages in order, using one detect worker")
+        detect_workers = 1
+
+    stop = threading.Event()
+    errors: list[BaseException] = []
+    todo: queue.Queue = queue.Queue()
+    for n in range(len(pdfs)):
+        todo.put(n)
+    rendered: queue.Queue = queue.Queue(config.queue_size)
+    detected: queue.Queue = queue.Queue(config.queue_size)
+    done: queue.Queue = queue.Queue()
+    # Page count and page numbers to process of each PDF, set by the render
+    # stage before the first item of the PDF is queued.
+    expected: dict[int, tuple[int, list[int]]] = {}
+
+    def put(q: queue.Queue, item):
+        while True:
+            if stop.is_set():
+                raise PipelineStopped
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(q: queue.Queue):
+        while True:
+            if stop.is_set():
+                raise PipelineStopped
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def render():
+        while True:
+            try:
+                n = todo.get_nowait()
+            except queue.Empty:
+                return
+            pdf = pdfs[n]
+            logger.info(f"Processing File: {pdf.name} - started")
+            skip = skip_pages[n] if skip_pages else ()
+            count = pdf_page_count(pdf)
+            pagenums = [pagenum for pagenum in range(count) if pagenum not in skip]
+            expected[n] = count, pagenums
+            # Only matters for PDFs without pages to process.
+            put(rendered, ("pdf", n))
+            images = iter_page_images(pdf, dpi, pagenums, stage_cache)
+            for pagenum, image, render_key in images:
+                put(rendered, ("page", n, pagenum, (image, render_key)))
+
+    templates: dict[int, GridTemplate | None] = {}
+
+    def detect():
+        while (item := get(rendered)) is not None:
+            if item[0] == "page":
+                _, n, pagenum, (image, render_key) = item
+                with profiling.page_scope(pdfs[n].name, pagenum):
+                    page = process_page(
+                        pdf_name=pdfs[n].name,
+                        pagenum=pagenum,
+                        image=image,
+                        options=options,
+                        dpi=dpi,
+                        template=templates.get(n),
+                        pdf_path=pdfs[n],
+                        stage_cache=stage_cache,
+                        render_key=render_key,
+                    )
+                templates[n] = next_template(page, templates.get(n), options)
+                item = ("page", n, pagenum, page)
+            put(detected, item)
+
+    def ocr():
+        while (item := get(detected)) is not None:
+            if item[0] == "page":
+                _, n, pagenum, page = item
+                item = ("page", n, pagenum, process_page_records(page, options))
+            put(done, item)
+
+    def run_stage(func: Callable[[], None], workers: int, next_queue, n_next: int):
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                func()
+            except PipelineStopped:
+                return
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+                return
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            # The last worker of a stage tells each worker of the next to stop.
+            if last:
+                for _ in range(n_next):
+                    try:
+                        put(next_queue, None)
+                    except PipelineStopped:
+                        return
+
+        threads = [
+            threading.Thread(target=worker, name=f"{func.__name__}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    threads = [
+        *run_stage(render, config.render_workers, rendered, detect_workers),
+        *run_stage(detect, detect_workers, detected, config.ocr_workers),
+        *run_stage(ocr, config.ocr_workers, done, 1),
+    ]
+
+    # Pages finish in any order, results are released in PDF and page order.
+    pages: dict[int, dict[int, PdfResult]] = {}
+    next_pdf = 0
+    released = 0
+    result = PdfResult(pdf_name=pdfs[0].name)
+    try:
+        while next_pdf < len(pdfs):
+            item = get(done)
+            if item is None:
+                break
+            if item[0] == "page":
+                _, n, pagenum, page_result = item
+                pages.setdefault(n, {})[pagenum] = page_result
+            while next_pdf in expected:
+                count, pagenums = expected[next_pdf]
+                waiting = pages.get(next_pdf, {})
+                while released < len(pagenums) and pagenums[released] in waiting:
+                    pagenum = pagenums[released]
+                    page_result = waiting.pop(pagenum)
+                    result.extend(page_result)
+                    if on_page is not None:
+                        on_page(next_pdf, pagenum, count, page_result)
+                    released += 1
+                if released < len(pagenums):
+                    break
+                pages.pop(next_pdf, None)
+                logger.info(f"Processing File: {pdfs[next_pdf].name} - completed")
+                on_result(next_pdf, result)
+                next_pdf += 1
+                released = 0
+                if next_pdf < len(pdfs):
+                    result = PdfResult(pdf_name=pdfs[next_pdf].name)
+    except PipelineStopped:
+        pass
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    if next_pdf < len(pdfs):
+        raise RuntimeError(f"Pipeline stopped before {pdfs[next_pdf].name}")
+
+
+def write_result(
+    report: CheckpointedReport,
+    result: PdfResult,
+    page: int | None = None,
+    key: str | None = None,
+    stored_run: StoredRun | None = None,
+):
+    """Append the records of a page, or of a whole PDF, to the report.
+
+    The manifest entry is made under `key`, the PDF name by default. With a
+    `stored_run`, the records also go to its results database.
+    """
+    rows = [asdict(record) for record in result.records]
+    with profiling.span("report_write"):
+        report.write(
+            key or result.pdf_name,
+            page,
+            rows,
+            blank_cells=result.blank_cells,
+            reconstructed_pages=len(result.reconstructed),
+        )
+    if stored_run is not None:
+        with profiling.span("db_write"):
+            stored_run.write(result.pdf_name, page, rows, result.reconstructed, key)
+
+
+def open_report(src_folder, fingerprint: str, resume: bool) -> CheckpointedReport:
+    fieldnames = [f.name for f in fields(ResultRecord)]
+    if resume:
+        path = find_interrupted_report(src_folder)
+        if path is not None:
+            return CheckpointedReport.resume(path, fieldnames, fingerprint)
+        logger.info(f"No interrupted report in {src_folder}, starting a new one")
+    now = datetime.now().strftime("%d-%m-%Y_%H%M.%S")
+    path = Path(src_folder).joinpath(f"report_{now}.csv").absolute()
+    return CheckpointedReport.create(path, fieldnames, fingerprint)
+
+
+# How often the pool checks for a cancelled run while PDFs are processed.
+CANCEL_POLL_SECONDS = 0.2
+
+
+def run_pool(
+    pdfs: list[Path],
+    options: ProcessOptions,
+    workers: int,
+    on_result: Callable[[int], None],
+    on_page: Callable[[int, int, int, PdfResult], None],
+    skip_pages: list[Collection[int]] | None = None,
+    stage_cache: StageCache | None = None,
+):
+    """Process `pdfs` on `workers` processes, a whole PDF per task.
+
+    Workers send every page back as it is done, see `send_pdf_records`.
+    `on_page(i, pagenum, n_pages, result)` is called in this process for
+    each page of `pdfs[i]`, and `on_result(i)` after its last page, so the
+    pages of the PDFs being processed come in interleaved. Profiles of the
+    workers are merged into the active profiler, and cancelling the active
+    token stops the workers too.
+    """
+    skip_pages = skip_pages or [() for _ in pdfs]
+    profiler = profiling.active()
+    # Workers check this event instead of the run's token, it is set when
+    # the run is cancelled or a worker fails. Their pages come through a
+    # manager queue, so a worker can exit even when nothing reads it anymore.
+    worker_cancel = multiprocessing.Event()
+    with multiprocessing.Manager() as manager:
+        page_queue = manager.Queue()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(worker_cancel, page_queue),
+        ) as executor:
+            running = {
+                executor.submit(
+                    send_pdf_records,
+                    i,
+                    pdf,
+                    options,
+                    skip_pages[i],
+                    stage_cache,
+                    profiler is not None,
+                )
+                for i, pdf in enumerate(pdfs)
+            }
+            # PDFs whose last page has not come in yet.
+            sending = set(range(len(pdfs)))
+            try:
+                while sending or running:
+                    progress.check_cancelled()
+                    for future in [future for future in running if future.done()]:
+                        running.discard(future)
+                        # Raises the error of a failed worker.
+                        profile = future.result()
+                        if profiler is not None:
+                            profiler.merge(profile)
+                    if not sending:
+                        wait(running, timeout=CANCEL_POLL_SECONDS)
+                        continue
+                    try:
+                        i, pagenum, n_pages, result = page_queue.get(
+                            timeout=CANCEL_POLL_SECONDS
+                        )
+                    except queue.Empty:
+                        continue
+                    if pagenum is None:
+                        sending.discard(i)
+                        on_result(i)
+                    else:
+                        on_page(i, pagenum, n_pages, result)
+            except BaseException:
+                # Cancelled or failed, the other workers stop after their
+                # current page.
+                worker_cancel.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+
+def resolve_workers(workers: int | None) -> int:
+    if not workers or workers < 1:
+        return os.cpu_count() or 1
+    return workers
+
+
+def resolve_ocr_threads(ocr_threads: int, workers: int) -> int:
+    """OCR threads per worker, 0 splits the CPU cores between the workers."""
+    if ocr_threads < 1:
+        return max((os.cpu_count() or 1) // workers, 1)
+    return ocr_threads
+
+
+def omp_thread_limit(workers: int, ocr_threads: int) -> int | None:
+    """OpenMP threads per tesseract run, so concurrent runs share the cores.
+
+    None leaves a single tesseract run free to use every core.
+    """
+    concurrent = workers * ocr_threads
+    if concurrent <= 1:
+        return None
+    return max((os.cpu_count() or 1) // concurrent, 1)
 
 
 def main(
-    src_folder, progress_callback: Callable[[str, int | None], None] | None = None
+    src_folder,
+    progress_callback: Callable[[str, int | None], None] | None = None,
+    workers: int | None = 1,
+    options: ProcessOptions | None = None,
+    cache_dir: str | Path | None = None,
+    cache_size_mb: int = DEFAULT_CACHE_SIZE_MB,
+    pipeline: PipelineConfig | None = None,
+    resume: bool = False,
+    profiler: Profiler | None = None,
+    db_path: str | Path | None = None,
+    stage_cache_dir: str | Path | None = None,
+    stage_cache_size_mb: int = DEFAULT_STAGE_CACHE_SIZE_MB,
+    overlays: bool = False,
+    on_progress: Callable[[ProgressEvent], None] | None = None,
+    cancel: CancelToken | None = None,
 ) -> str:
-    if progress_callback is None:
+    """`process_folder` with `profiler` and `cancel` made active for the run."""
+    with profiling.activate(profiler), progress.cancellable(cancel):
+        return process_folder(
+            src_folder,
+            progress_callback,
+            workers,
+            options,
+            cache_dir,
+            cache_size_mb,
+            pipeline,
+            resume,
+            db_path,
+            stage_cache_dir,
+            stage_cache_size_mb,
+            overlays,
+            on_progress,
+        )
 
-        def dummy(*_: Any):
-            pass
 
-        progress_callback = dummy
+def process_folder(
+    src_folder,
+    progress_callback: Callable[[str, int | None], None] | None = None,
+    workers: int | None = 1,
+    options: ProcessOptions | None = None,
+    cache_dir: str | Path | None = None,
+    cache_size_mb: int = DEFAULT_CACHE_SIZE_MB,
+    pipeline: PipelineConfig | None = None,
+    resume: bool = False,
+    db_path: str | Path | None = None,
+    stage_cache_dir: str | Path | None = None,
+    stage_cache_size_mb: int = DEFAULT_STAGE_CACHE_SIZE_MB,
+    overlays: bool = False,
+    on_progress: Callable[[ProgressEvent], None] | None = None,
+) -> str:
+    """Process every PDF in `src_folder` and write a CSV report next to them.
+
+    Records are appended to the report as pages finish, with a manifest of
+    the pages written, see `CheckpointedReport`. With `resume`, the most
+    recent report left unfinished in `src_folder` is completed instead of
+    starting a new one, and its pages are not processed again.
+
+    `workers` is the number of PDFs processed in parallel, each in its own
+    process. Pass 0 or None to use one worker per CPU core. Each worker OCRs
+    `options.ocr_threads` cells at a time, and tesseract's own OpenMP
+    threads are capped so the total stays within the CPU cores. Pages still
+    go to the report one at a time, so the rows of the PDFs processed in
+    parallel are interleaved, see `run_pool`.
+
+    With a single worker, a `pipeline` config overlaps the rendering, grid
+    detection and OCR of the pages on threads instead, see `run_pipeline`.
+
+    With a `cache_dir`, the results of each PDF are cached by its content
+    and the processing settings, and unchanged PDFs are not processed again.
+
+    With a `db_path`, the records are also stored in that SQLite database,
+    see `results_db`.
+
+    With a `stage_cache_dir`, the rendered pages and their grids are cached
+    by PDF content, page and the settings of each stage. A run that only
+    changes OCR or ink scoring settings then skips rendering and grid
+    detection, one that changes grid settings skips rendering.
+
+    With `overlays`, JPEG previews of the pages with reconstructed cells or
+    doubtful fields are saved to a folder named after the report, see
+    `write_overlay`. PDFs loaded from the result cache get none.
+
+    Progress goes to `on_progress` as `ProgressEvent`s and, as a message and
+    a percentage, to `progress_callback`, both a few times per second at
+    most, see `ProgressReporter`.
+
+    The time spent in each processing stage and the cells, OCR calls and
+    reconstructed cells of each page are recorded into the active profiler,
+    see `profiling.activate`. Cancelling the active token from another
+    thread stops the run between pages and OCR calls, worker processes
+    included, with `progress.Cancelled`, see `progress.cancellable`. The
+    report is left resumable.
+    """
+    options = options or ProcessOptions()
+
+    def send_progress(event: ProgressEvent):
+        if progress_callback is not None:
+            progress_callback(event.message, int(event.percent))
+        if on_progress is not None:
+            on_progress(event)
 
     if not Path(src_folder).exists():
         raise FileExistsError(f"Source folder {src_folder} not found")
-    pdfs = list(Path(src_folder).glob("*.pdf"))
+    pdfs = sorted(Path(src_folder).glob("*.pdf"))
     if not pdfs:
         raise FileNotFoundError(f"No PDF files found in {src_folder} folder")
 
-    records = []
-    reconstructed = {}
-    pdf_step = 100 // len(pdfs)
-
-    for n, pdf in enumerate(pdfs):
-        progress = pdf_step * n
-        progress_msg = f"File {(n + 1)}/{len(pdfs)}, {pdf.name}"
-
-        progress_callback(progress_msg + ": reading page images", progress)
-        pages = process_pdf(pdf=pdf)
+    fingerprint = processing_fingerprint(options)
+    report = open_report(src_folder, fingerprint, resume)
+    if overlays:
+        overlay_dir = report.path.with_name(f"{report.path.stem}_overlays")
+        options = replace(options, overlay_dir=str(overlay_dir))
+    result_store = ResultStore(db_path) if db_path is not None else None
+    stored_run = None
+    if result_store is not None:
+        stored_run = result_store.run(report.path, src_folder, fingerprint)
+    # Pages already in a resumed report.
+    skip_pages = [report.pages_done(pdf.name) for pdf in pdfs]
+    # Results waiting for the PDFs before them to be written, None for PDFs
+    # that were written page by page.
+    finished: dict[int, PdfResult | None] = {
+        n: None for n, pdf in enumerate(pdfs) if pdf.name in report.done_pdfs
+    }
+    next_pdf = 0
+    reporter = ProgressReporter(send_progress, len(pdfs), files_done=len(finished))
+
+    def write_finished():
+        # PDFs loaded from the cache are written whole, in PDF order.
+        nonlocal next_pdf
+        while next_pdf in finished:
+            result = finished.pop(next_pdf)
+            if result is not None:
+                write_result(report, result, stored_run=stored_run)
+            next_pdf += 1
+
+    def write_page(n: int, pagenum: int, result: PdfResult):
+        # Pages are written as they come, after any cached PDFs before `n`.
+        write_finished()
+        write_result(report, result, pagenum, stored_run=stored_run)
+
+    stage_cache = None
+    if stage_cache_dir is not None:
+        stage_cache = StageCache(stage_cache_dir, max_bytes=stage_cache_size_mb << 20)
+    cache = None
+    cache_keys: dict[int, str] = {}
+    if cache_dir is not None:
+        cache = ResultCache(cache_dir, max_bytes=cache_size_mb << 20)
+        for n, pdf in enumerate(pdfs):
+            # Partly written PDFs are only completed, and not cached.
+            if n in finished or skip_pages[n]:
+                continue
+            cache_keys[n] = result_cache_key(pdf, fingerprint)
+            cached = cache.get(cache_keys[n])
+            if cached is not None:
+                finished[n] = cached.renamed(pdf.name)
+                reporter.update(
+                    f"File {(n + 1)}/{len(pdfs)}, {pdf.name}: loaded from cache",
+                    file=n,
+                    fraction=1.0,
+                )
+    write_finished()
+
+    pending = [n for n in range(len(pdfs)) if n not in finished and n >= next_pdf]
+    workers = min(resolve_workers(workers), max(len(pending), 1))
+    if pipeline is not None and workers > 1:
+        logger.warning("The page pipeline only runs with one worker, not used")
+        pipeline = None
+    # PDF workers, or pages OCR'd at the same time in the pipeline.
+    ocr_workers = workers if pipeline is None else pipeline.ocr_workers
+    options = replace(
+        options, ocr_threads=resolve_ocr_threads(options.ocr_threads, ocr_workers)
+    )
+    # Set before the worker processes start, so they inherit it.
+    limit_omp_threads(omp_thread_limit(ocr_workers, options.ocr_threads))
+
+    def store(n: int, result: PdfResult, written: bool = False):
+        """Cache the result of a PDF, and write it unless its pages were."""
+        if cache is not None and n in cache_keys:
+            cache.put(cache_keys[n], result)
+        finished[n] = None if written else result
+        write_finished()
+        reporter.update(file=n, fraction=1.0)
+
+    try:
+        if pipeline is not None:
+            reporter.update(f"Processing {len(pending)} files in a pipeline")
+
+            def page_done(i: int, pagenum: int, n_pages: int, result: PdfResult):
+                n = pending[i]
+                write_page(n, pagenum, result)
+                reporter.update(
+                    f"File {(n + 1)}/{len(pdfs)}, {pdfs[n].name}: "
+                    f"page {(pagenum + 1)}/{n_pages} done",
+                    file=n,
+                    fraction=(pagenum + 1) / n_pages,
+                    pages=1,
+                    cells=len(result.records) * N_COLUMNS,
+                )
 
-        page_step = pdf_step // len(pages)
+            run_pipeline(
+                [pdfs[n] for n in pending],
+                options,
+                pipeline,
+                on_result=lambda i, result: store(pending[i], result, written=True),
+                on_page=page_done,
+                skip_pages=[skip_pages[n] for n in pending],
+                stage_cache=stage_cache,
+            )
+        elif workers == 1:
+            for n in pending:
+                pdf = pdfs[n]
+                progress_msg = f"File {(n + 1)}/{len(pdfs)}, {pdf.name}"
+                reporter.update(progress_msg + ": reading page images")
+
+                def page_callback(pagenum: int, n_pages: int):
+                    reporter.update(
+                        progress_msg + f": analyzing page {(pagenum + 1)}/{n_pages}",
+                        file=n,
+                        fraction=pagenum / n_pages,
+                    )
+
+                # Only kept whole for the cache, the report gets every page.
+                result = PdfResult(pdf_name=pdf.name)
+                for pagenum, page_result in iter_page_records(
+                    pdf, options, page_callback, skip_pages[n], stage_cache
+                ):
+                    write_page(n, pagenum, page_result)
+                    reporter.update(
+                        pages=1, cells=len(page_result.records) * N_COLUMNS
+                    )
+                    if n in cache_keys:
+                        result.extend(page_result)
+                store(n, result, written=True)
+        else:
+            reporter.update(f"Processing {len(pending)} files on {workers} workers")
+            # Pages of the PDFs that go to the result cache.
+            results = {n: PdfResult(pdfs[n].name) for n in pending if n in cache_keys}
+
+            def pool_page(i: int, pagenum: int, n_pages: int, result: PdfResult):
+                n = pending[i]
+                write_page(n, pagenum, result)
+                reporter.update(
+                    file=n,
+                    fraction=(pagenum + 1) / n_pages,
+                    pages=1,
+                    cells=len(result.records) * N_COLUMNS,
+                )
+                if n in results:
+                    results[n].extend(result)
+
+            def pool_result(i: int):
+                n = pending[i]
+                store(n, results.pop(n, PdfResult(pdfs[n].name)), written=True)
+                reporter.update(
+                    f"File {(n + 1)}/{len(pdfs)}, {pdfs[n].name}: completed"
+                )
 
-        for page in pages:
-            page_progress = progress + page_step * page.pagenum
-            progress_callback(
-                progress_msg + f": analyzing page {(page.pagenum + 1)}/{len(pages)}",
-                page_progress,
+            run_pool(
+                [pdfs[n] for n in pending],
+                options,
+                workers,
+                on_result=pool_result,
+                on_page=pool_page,
+                skip_pages=[skip_pages[n] for n in pending],
+                stage_cache=stage_cache,
             )
-            ocr_results = process_ocr(page=page)
-            records.extend(ocr_results)
-            if page.reconstructed:
-                reconstructed[f"{page.pdf_name}:{page.pagenum}"] = page.reconstructed
+    except BaseException:
+        # The manifest stays, so the run can be resumed.
+        report.close(complete=False)
+        reporter.close()
+        raise
+    finally:
+        if result_store is not None:
+            result_store.close()
+    report.close()
+
+    summary = (
+        f"{len(pdfs)} files, {report.n_records} records, "
+        f"{report.reconstructed_pages} pages with reconstructed cells, "
+        f"{report.blank_cells} blank text cells skipped OCR"
+    )
+    logger.info(f"Summary: {summary}")
+    reporter.update(summary, final=True)
+    return str(report.path)
+
+
+def add_option_arguments(parser: argparse.ArgumentParser):
+    """Add the command line flags of the `ProcessOptions` fields."""
+    parser.add_argument(
+        "--ocr-mode",
+        choices=OCR_MODES,
+        default="cell",
+        help="OCR every text cell separately, or batch them per column or per page",
+    )
+    parser.add_argument(
+        "--ocr-backend",
+        choices=OCR_BACKENDS,
+        default="pytesseract",
+        help="run the tesseract CLI per call, or keep pooled engines in process",
+    )
+    parser.add_argument(
+        "--ocr-threads",
+        type=int,
+        default=1,
+        help="text cells OCRed concurrently per worker, 0 to share the CPU cores",
+    )
+    parser.add_argument(
+        "--ocr-blank-cells",
+        action="store_true",
+        help="OCR every text cell, including the ones found to have no ink",
+    )
+    parser.add_argument(
+        "--digit-reader",
+        choices=DIGIT_READERS,
+        default="tesseract",
+        help="read record numbers and EGNs with tesseract, or try digit templates "
+        "on EGNs first",
+    )
+    parser.add_argument(
+        "--first-pass-dpi",
+        type=int,
+        help="process pages at this DPI, e.g. 150, and OCR doubtful text cells "
+        f"again at {RENDER_DPI} DPI",
+    )
+    parser.add_argument(
+        "--detect-dpi",
+        type=int,
+        help="detect the table grid on a copy downscaled to this DPI, e.g. 100",
+    )
+    parser.add_argument(
+        "--grid-template",
+        action="store_true",
+        help="reuse the grid of the first clean page for the rest of each PDF",
+    )
+    parser.add_argument(
+        "--grid-detector",
+        choices=list(GRID_DETECTORS),
+        default="morphology",
+        help="find table lines by morphology and contours, or by ink projections",
+    )
 
-    now = datetime.now().strftime("%d-%m-%Y_%H%M.%S")
 
-    out_path = str(Path(src_folder).joinpath(f"report_{now}.csv").absolute())
-    write_records_csv(records=records, out_path=out_path)
-    return out_path
+def options_from_args(args: argparse.Namespace) -> ProcessOptions:
+    return ProcessOptions(
+        ocr_mode=args.ocr_mode,
+        ocr_backend=args.ocr_backend,
+        ocr_threads=args.ocr_threads,
+        skip_blank_cells=not args.ocr_blank_cells,
+        digit_reader=args.digit_reader,
+        first_pass_dpi=args.first_pass_dpi,
+        detect_dpi=args.detect_dpi,
+        grid_template=args.grid_template,
+        grid_detector=args.grid_detector,
+    )
 
 
 if __name__ == "__main__":
-    import sys
     from logging.handlers import RotatingFileHandler
 
     logging.basicConfig(
@@ -425,6 +2495,89 @@ if __name__ == "__main__":
         encoding="utf-8",
     )
     logging.getLogger("pytesseract").setLevel(logging.WARNING)
-    if not len(sys.argv) == 2:
-        ValueError("Please provide source folder path as argument")
-    main(src_folder=sys.argv[1])
+
+    parser = argparse.ArgumentParser(description="Extract register records from PDFs")
+    parser.add_argument("src_folder", help="folder containing the PDF files")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of PDFs processed in parallel, 0 for one per CPU core",
+    )
+    add_option_arguments(parser)
+    parser.add_argument(
+        "--pipeline",
+        nargs=3,
+        type=int,
+        metavar=("RENDER", "DETECT", "OCR"),
+        help="with one worker, overlap rendering, grid detection and OCR on "
+        "this many threads each",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="complete the last report left unfinished in the folder",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="JSON",
+        help="time the processing stages, save the profile to this file and "
+        "print a summary",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="reuse the results of PDFs that have not changed since the last run",
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help="evict the least recently used results above this size",
+    )
+    parser.add_argument(
+        "--db",
+        help="also store the records in this SQLite database, for lookups "
+        "across runs with results_db.py",
+    )
+    parser.add_argument(
+        "--stage-cache-dir",
+        help="cache rendered pages and grids, so runs that only change later "
+        "stages skip rendering and grid detection",
+    )
+    parser.add_argument(
+        "--stage-cache-size-mb",
+        type=int,
+        default=DEFAULT_STAGE_CACHE_SIZE_MB,
+        help="evict the least recently used pages above this size",
+    )
+    parser.add_argument(
+        "--overlays",
+        action="store_true",
+        help="save previews of the pages with reconstructed cells or doubtful "
+        "fields next to the report, for review",
+    )
+    args = parser.parse_args()
+    options = options_from_args(args)
+    profiler = Profiler() if args.profile else None
+    pipeline = None
+    if args.pipeline:
+        render_workers, detect_workers, ocr_workers = args.pipeline
+        pipeline = PipelineConfig(render_workers, detect_workers, ocr_workers)
+    main(
+        src_folder=args.src_folder,
+        workers=args.workers,
+        options=options,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size_mb,
+        pipeline=pipeline,
+        resume=args.resume,
+        profiler=profiler,
+        db_path=args.db,
+        stage_cache_dir=args.stage_cache_dir,
+        stage_cache_size_mb=args.stage_cache_size_mb,
+        overlays=args.overlays,
+    )
+    if profiler is not None:
+        profiler.save(args.profile)
+        print(profiler.summary_table())
@@ -0,0 +1,172 @@
+"""CSV report written page by page, so an interrupted run can be resumed."""
+
+import csv
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = ".manifest.jsonl"
+
+
+def manifest_path(report_path: str | Path) -> Path:
+    return Path(f"{report_path}{MANIFEST_SUFFIX}")
+
+
+def find_interrupted_report(folder: str | Path) -> Path | None:
+    """Most recent report in `folder` whose run did not finish."""
+    manifests = sorted(
+        Path(folder).glob(f"report_*.csv{MANIFEST_SUFFIX}"),
+        key=lambda path: path.stat().st_mtime,
+    )
+    for manifest in reversed(manifests):
+        report = manifest.with_name(manifest.name.removesuffix(MANIFEST_SUFFIX))
+        if report.exists():
+            return report
+    return None
+
+
+def header_size(path: Path) -> int:
+    """Bytes of the BOM and header line at the start of a report."""
+    with open(path, "rb") as f:
+        return len(f.readline())
+
+
+class CheckpointedReport:
+    """CSV report appended to as results come in, with a manifest of them.
+
+    The manifest next to the report has a header line with the settings
+    `fingerprint`, then one JSON line per checkpoint: a page of a PDF, or a
+    whole PDF when `page` is None. Rows are flushed to disk before their
+    manifest line, and the manifest records the report size after them, so
+    rows of a checkpoint cut short by a crash are dropped on resume. The
+    manifest is removed once the report is complete.
+    """
+
+    def __init__(self, path: str | Path, fieldnames: list[str], fingerprint: str):
+        self.path = Path(path)
+        self.manifest_path = manifest_path(self.path)
+        self.fieldnames = fieldnames
+        self.fingerprint = fingerprint
+        self.done_pdfs: set[str] = set()
+        self.done_pages: dict[str, set[int]] = {}
+        self.n_records = 0
+        self.blank_cells = 0
+        self.reconstructed_pages = 0
+        self.size = 0
+
+    @classmethod
+    def create(
+        cls, path: str | Path, fieldnames: list[str], fingerprint: str
+    ) -> "CheckpointedReport":
+        report = cls(path, fieldnames, fingerprint)
+        with open(report.path, "w", newline="", encoding="utf-8-sig") as f:
+            csv.writer(f, delimiter=";").writerow(fieldnames)
+        report.size = report.path.stat().st_size
+        report._write_manifest([{"fingerprint": fingerprint, "fields": fieldnames}])
+        report._open()
+        return report
+
+    @classmethod
+    def resume(
+        cls, path: str | Path, fieldnames: list[str], fingerprint: str
+    ) -> "CheckpointedReport":
+        """Continue an interrupted report, see `find_interrupted_report`."""
+        report = cls(path, fieldnames, fingerprint)
+        with open(report.manifest_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        header = json.loads(lines[0])
+        if header["fingerprint"] != fingerprint or header["fields"] != fieldnames:
+            raise ValueError(
+                f"{report.path.name} was written with different settings, "
+                "it cannot be resumed"
+            )
+
+        entries = []
+        for line in lines[1:]:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Only the last line can be torn, by a crash while writing it.
+                logger.warning(f"Ignoring incomplete checkpoint in {report.path.name}")
+                break
+        report.size = entries[-1]["end"] if entries else header_size(report.path)
+        for entry in entries:
+            report._count(entry)
+
+        # Drop rows written after the last checkpoint, and the torn line.
+        os.truncate(report.path, report.size)
+        report._write_manifest([header, *entries])
+        report._open()
+        logger.info(
+            f"Resuming {report.path.name}: {len(report.done_pdfs)} files and "
+            f"{sum(map(len, report.done_pages.values()))} pages already done"
+        )
+        return report
+
+    def _write_manifest(self, lines: list[dict[str, Any]]):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.manifest_path)
+
+    def _open(self):
+        # Text appended at a non-zero offset gets no second BOM.
+        self._file = open(self.path, "a", newline="", encoding="utf-8-sig")
+        self._writer = csv.DictWriter(
+            self._file, fieldnames=self.fieldnames, delimiter=";"
+        )
+        self._manifest = open(self.manifest_path, "a", encoding="utf-8")
+
+    def _count(self, entry: dict[str, Any]):
+        if entry["page"] is None:
+            self.done_pdfs.add(entry["pdf"])
+        else:
+            self.done_pages.setdefault(entry["pdf"], set()).add(entry["page"])
+        self.n_records += entry["records"]
+        self.blank_cells += entry["blank_cells"]
+        self.reconstructed_pages += entry["reconstructed_pages"]
+
+    def pages_done(self, pdf_name: str) -> set[int]:
+        """Pages of a PDF in the report, not counting PDFs written whole."""
+        return self.done_pages.get(pdf_name, set())
+
+    def write(
+        self,
+        pdf_name: str,
+        page: int | None,
+        rows: list[dict[str, Any]],
+        blank_cells: int = 0,
+        reconstructed_pages: int = 0,
+    ):
+        """Append the rows of a page, or of a whole PDF, and checkpoint them."""
+        self._writer.writerows(rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.size = os.fstat(self._file.fileno()).st_size
+
+        entry = {
+            "pdf": pdf_name,
+            "page": page,
+            "records": len(rows),
+            "blank_cells": blank_cells,
+            "reconstructed_pages": reconstructed_pages,
+            "end": self.size,
+        }
+        self._manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._manifest.flush()
+        os.fsync(self._manifest.fileno())
+        self._count(entry)
+
+    def close(self, complete: bool = True):
+        """Close the files, and remove the manifest if the report is done."""
+        self._file.close()
+        self._manifest.close()
+        if complete:
+            self.manifest_path.unlink(missing_ok=True)
+        logger.debug(f"Finished writing {self.path}")
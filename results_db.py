@@ -0,0 +1,310 @@
+"""SQLite store of the records of every run, for lookups across reports.
+
+Runs write their records to the report CSV and, with a database, to it as
+well, with EGNs, PDFs and pages indexed. The records of a PDF processed
+again in a later run replace the earlier ones.
+
+Usage (from the project folder):
+
+    python results_db.py results.db egn 8001011234
+    python results_db.py results.db missing-signatures --since 2026-10-01
+    python results_db.py results.db pdfs
+"""
+
+import argparse
+import csv
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    report TEXT NOT NULL UNIQUE,
+    folder TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    started TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pdfs (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    -- Report manifest key the records were written under.
+    key TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    UNIQUE (folder, name)
+);
+CREATE INDEX IF NOT EXISTS pdfs_name ON pdfs (name);
+CREATE TABLE IF NOT EXISTS records (
+    pdf_id INTEGER NOT NULL REFERENCES pdfs (id),
+    page INTEGER NOT NULL,
+    number INTEGER,
+    name TEXT,
+    address TEXT,
+    egn INTEGER,
+    date REAL,
+    signature REAL,
+    note REAL,
+    ocr_dpi INTEGER,
+    processed TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_egn ON records (egn);
+CREATE INDEX IF NOT EXISTS records_pdf_page ON records (pdf_id, page);
+CREATE TABLE IF NOT EXISTS reconstructed_cells (
+    pdf_id INTEGER NOT NULL REFERENCES pdfs (id),
+    page INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    w INTEGER NOT NULL,
+    h INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reconstructed_cells_pdf_page
+    ON reconstructed_cells (pdf_id, page);
+"""
+
+# `ResultRecord` fields stored in the records table, `pdf` is in pdfs.
+RECORD_COLUMNS = (
+    "page",
+    "number",
+    "name",
+    "address",
+    "egn",
+    "date",
+    "signature",
+    "note",
+    "ocr_dpi",
+)
+MISSING_SIGNATURE_THRESHOLD = 0.3
+# Rows of the table that hold a record, and not blank lines.
+FILLED_ROW = "(r.egn IS NOT NULL OR COALESCE(r.name, '') != '')"
+RECORD_SELECT = """
+SELECT p.folder, p.name AS pdf, r.page, r.number, r.name, r.address, r.egn,
+    r.date, r.signature, r.note, r.processed
+FROM records r JOIN pdfs p ON p.id = r.pdf_id
+"""
+
+
+def page_of(page_key: str) -> int:
+    """Page number of a `PdfResult.reconstructed` key, "pdf:page"."""
+    return int(page_key.rpartition(":")[2])
+
+
+class ResultStore:
+    """Records and reconstructed cells of the runs, in a SQLite database."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        # Readers are not blocked by a run writing, and commits do not wait
+        # for the disk, only checkpoints do.
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def run(
+        self, report: str | Path, folder: str | Path, fingerprint: str
+    ) -> "StoredRun":
+        """Writer for the run of `report`, the same one when it is resumed."""
+        report = str(Path(report).resolve())
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (report, folder, fingerprint, started) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (report) DO NOTHING",
+                (report, str(Path(folder).resolve()), fingerprint, now()),
+            )
+        row = self.conn.execute(
+            "SELECT id, folder FROM runs WHERE report = ?", (report,)
+        ).fetchone()
+        return StoredRun(self.conn, row["id"], row["folder"])
+
+    def find_egn(self, egn: int, since: str = "") -> list[sqlite3.Row]:
+        return self.conn.execute(
+            RECORD_SELECT + "WHERE r.egn = ? AND r.processed >= ? "
+            "ORDER BY r.processed, p.name, r.page",
+            (egn, since),
+        ).fetchall()
+
+    def missing_signatures(
+        self,
+        threshold: float = MISSING_SIGNATURE_THRESHOLD,
+        since: str = "",
+        pdf: str | None = None,
+    ) -> list[sqlite3.Row]:
+        """Filled rows whose signature cell has less ink than `threshold`."""
+        query = (
+            RECORD_SELECT + f"WHERE {FILLED_ROW} AND COALESCE(r.signature, 0) < ? "
+            "AND r.processed >= ? "
+        )
+        params: list[Any] = [threshold, since]
+        if pdf is not None:
+            query += "AND p.name = ? "
+            params.append(pdf)
+        query += "ORDER BY p.folder, p.name, r.page, r.number"
+        return self.conn.execute(query, params).fetchall()
+
+    def pdf_summaries(
+        self, threshold: float = MISSING_SIGNATURE_THRESHOLD, since: str = ""
+    ) -> list[sqlite3.Row]:
+        """Pages, records, missing signatures and reconstructed cells per PDF."""
+        return self.conn.execute(
+            f"""
+            SELECT p.folder, p.name AS pdf,
+                COUNT(DISTINCT r.page) AS pages,
+                COUNT(r.pdf_id) AS records,
+                COALESCE(
+                    SUM({FILLED_ROW} AND COALESCE(r.signature, 0) < ?), 0
+                ) AS missing_signatures,
+                (
+                    SELECT COUNT(*) FROM reconstructed_cells c
+                    WHERE c.pdf_id = p.id
+                ) AS reconstructed_cells,
+                MAX(r.processed) AS processed
+            FROM pdfs p LEFT JOIN records r ON r.pdf_id = p.id
+            GROUP BY p.id
+            HAVING COALESCE(MAX(r.processed), '') >= ?
+            ORDER BY p.folder, p.name
+            """,
+            (threshold, since),
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+class StoredRun:
+    """Writes the results of one run, see `ResultStore.run`."""
+
+    def __init__(self, conn: sqlite3.Connection, run_id: int, folder: str):
+        self.conn = conn
+        self.run_id = run_id
+        self.folder = folder
+
+    def write(
+        self,
+        pdf_name: str,
+        page: int | None,
+        rows: list[dict[str, Any]],
+        reconstructed: dict[str, dict[tuple[int, int], Iterable[int]]],
+        key: str | None = None,
+    ):
+        """Store the rows of a page, or of a whole PDF, in one transaction.
+
+        `reconstructed` maps "pdf:page" to the (x, y, w, h) of each
+        reconstructed (row, col) cell, as in `PdfResult`. Earlier rows of
+        the pages written are replaced, so a page written again after an
+        interrupted run is not stored twice.
+        """
+        processed = now()
+        pages = {row["page"] for row in rows} | {page_of(k) for k in reconstructed}
+        if page is not None:
+            pages.add(page)
+        with self.conn:
+            pdf_id = self._pdf_id(pdf_name, key or pdf_name)
+            for table in ("records", "reconstructed_cells"):
+                self.conn.executemany(
+                    f"DELETE FROM {table} WHERE pdf_id = ? AND page = ?",
+                    [(pdf_id, pagenum) for pagenum in pages],
+                )
+            self.conn.executemany(
+                f"INSERT INTO records (pdf_id, {', '.join(RECORD_COLUMNS)}, "
+                f"processed) VALUES ({', '.join('?' * (len(RECORD_COLUMNS) + 2))})",
+                [
+                    (pdf_id, *(row[column] for column in RECORD_COLUMNS), processed)
+                    for row in rows
+                ],
+            )
+            self.conn.executemany(
+                "INSERT INTO reconstructed_cells (pdf_id, page, row, col, x, y, w, h) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (pdf_id, page_of(page_key), row_ndx, col_ndx, *cell)
+                    for page_key, cells in reconstructed.items()
+                    for (row_ndx, col_ndx), cell in cells.items()
+                ],
+            )
+
+    def _pdf_id(self, name: str, key: str) -> int:
+        row = self.conn.execute(
+            "SELECT id, key, run_id FROM pdfs WHERE folder = ? AND name = ?",
+            (self.folder, name),
+        ).fetchone()
+        if row is None:
+            cursor = self.conn.execute(
+                "INSERT INTO pdfs (folder, name, key, run_id) VALUES (?, ?, ?, ?)",
+                (self.folder, name, key, self.run_id),
+            )
+            return cursor.lastrowid  # type: ignore
+        if row["run_id"] != self.run_id or row["key"] != key:
+            # Processed again, the records of the earlier run are replaced.
+            for table in ("records", "reconstructed_cells"):
+                self.conn.execute(f"DELETE FROM {table} WHERE pdf_id = ?", (row["id"],))
+            self.conn.execute(
+                "UPDATE pdfs SET key = ?, run_id = ? WHERE id = ?",
+                (key, self.run_id, row["id"]),
+            )
+        return row["id"]
+
+
+def now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def print_rows(rows: list[sqlite3.Row]):
+    """Print rows semicolon separated, like the reports."""
+    writer = csv.writer(sys.stdout, delimiter=";")
+    if rows:
+        writer.writerow(rows[0].keys())
+    writer.writerows(tuple(row) for row in rows)
+
+
+def main():
+    # Options shared by the commands, given after the command name.
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--since",
+        default="",
+        help="only records processed on or after this date, e.g. 2026-10-01",
+    )
+    common.add_argument(
+        "--threshold",
+        type=float,
+        default=MISSING_SIGNATURE_THRESHOLD,
+        help="signature ink below which a signature counts as missing",
+    )
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db", type=Path, help="database written with --db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    egn = commands.add_parser("egn", parents=[common], help="records of an EGN")
+    egn.add_argument("egn", type=int)
+    missing = commands.add_parser(
+        "missing-signatures",
+        parents=[common],
+        help="filled rows without a signature",
+    )
+    missing.add_argument("--pdf", help="only in this PDF")
+    commands.add_parser("pdfs", parents=[common], help="summary of every PDF")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        parser.error(f"{args.db} not found")
+    store = ResultStore(args.db)
+    try:
+        if args.command == "egn":
+            rows = store.find_egn(args.egn, args.since)
+        elif args.command == "missing-signatures":
+            rows = store.missing_signatures(args.threshold, args.since, args.pdf)
+        else:
+            rows = store.pdf_summaries(args.threshold, args.since)
+    finally:
+        store.close()
+    print_rows(rows)
+    print(f"{len(rows)} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
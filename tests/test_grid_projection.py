@@ -0,0 +1,44 @@
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+import red_pdf
+from benchmarks.synthetic import draw_page, load_font, random_row
+
+N_ROWS = 20
+
+
+@pytest.fixture(scope="module")
+def page() -> np.ndarray:
+    rng = random.Random(0)
+    rows, egns = zip(*[random_row(rng, n + 1) for n in range(N_ROWS)])
+    image = draw_page(rng, load_font(), list(rows), list(egns), N_ROWS, False)
+    return red_pdf.prepare_page(np.array(image))
+
+
+def rotate(image: np.ndarray, degrees: float) -> np.ndarray:
+    h, w = image.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), degrees, 1)
+    return cv2.warpAffine(image, matrix, (w, h), borderValue=255)
+
+
+def test_straight_page(page):
+    found = red_pdf.scan_grid(page, red_pdf.RENDER_DPI, detector="projection")
+    assert found is not None
+    assert found[1].n_rows == N_ROWS
+
+
+@pytest.mark.parametrize("degrees", [0.2, 0.3, -0.3, 0.5])
+def test_skewed_page_falls_back_to_morphology(page, degrees):
+    image = rotate(page, degrees)
+    dpi = red_pdf.RENDER_DPI
+    assert red_pdf.scan_grid(image, dpi, detector="projection") is None
+
+    options = red_pdf.ProcessOptions(grid_detector="projection")
+    bw = red_pdf.preprocess(image)
+    _, grid, source = red_pdf.find_page_grid(image, bw, options, dpi, None, "skewed")
+    assert source == "detected"
+    assert grid.n_rows == N_ROWS
+    assert not grid.reconstructed.any()
@@ -1,10 +1,20 @@
 """Example for how to use the `qspreadsheet` package."""
 
+import os
 import sys
 import logging
 from logging.handlers import RotatingFileHandler
 
-from PySide6.QtCore import QPoint, QSettings, QSize, QThread, Signal, QObject, Qt
+from PySide6.QtCore import (
+    QPoint,
+    QSettings,
+    QSize,
+    QStandardPaths,
+    QThread,
+    Signal,
+    QObject,
+    Qt,
+)
 from PySide6.QtGui import QCloseEvent, QIcon
 from PySide6.QtWidgets import (
     QApplication,
@@ -18,10 +28,14 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QWidget,
     QProgressBar,
+    QSpinBox,
     QTextEdit,
 )
 
 import red_pdf
+from profiling import Profiler
+from progress import Cancelled, CancelToken, ProgressEvent
+from report import find_interrupted_report
 from version import __version__
 
 logger = logging.getLogger("red_pdf")
@@ -32,22 +46,36 @@ class ProcessWorker(QObject):
 
     progress = Signal(int)  # progress percentage
     status = Signal(str)  # status message
+    throughput = Signal(str)  # pages per second and time left
     finished = Signal(bool, str)  # (success, message)
 
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, workers: int = 1, resume: bool = False):
         super().__init__()
         self.folder_path = folder_path
+        self.workers = workers
+        self.resume = resume
         self.stop_requested = False
-
-    def progress_callback(self, message: str, progress: int = 0):
-        if progress < 1:
-            progress = 1
-        elif progress > 99:
-            progress = 99
-
-        self.status.emit(message)
-        self.progress.emit(progress)
-        self.progress
+        self.cancel = CancelToken()
+        self.profiler = Profiler()
+
+    def stop(self):
+        """Cancel the run, called from the GUI thread."""
+        self.stop_requested = True
+        self.cancel.cancel()
+
+    def on_progress(self, event: ProgressEvent):
+        # A few times per second at most, on the processing thread.
+        self.status.emit(event.message)
+        self.progress.emit(max(1, min(int(event.percent), 99)))
+        throughput = f"{event.pages_per_second:.2f} pages/s"
+        if event.eta_text():
+            throughput += f", {event.eta_text()}"
+        self.throughput.emit(throughput)
+
+    def cache_dir(self) -> str:
+        """Per-user folder where results of already processed PDFs are kept."""
+        location = QStandardPaths.StandardLocation.CacheLocation
+        return QStandardPaths.writableLocation(location) + "/results"
 
     def run(self):
         """Execute PDF processing."""
@@ -61,8 +89,16 @@ class ProcessWorker(QObject):
 
             # Call the main processing function
             result = red_pdf.main(
-                self.folder_path, progress_callback=self.progress_callback
+                self.folder_path,
+                workers=self.workers,
+                cache_dir=self.cache_dir(),
+                resume=self.resume,
+                profiler=self.profiler,
+                on_progress=self.on_progress,
+                cancel=self.cancel,
             )
+            logger.info(f"Run profile:\n{self.profiler.summary_table()}")
+            self.throughput.emit(f"{self.profiler.pages_per_second():.2f} pages/s")
 
             if self.stop_requested:
                 self.status.emit("Processing cancelled.")
@@ -72,6 +108,9 @@ class ProcessWorker(QObject):
             self.progress.emit(100)
             self.status.emit("Processing complete!")
             self.finished.emit(True, result)
+        except Cancelled:
+            self.status.emit("Processing cancelled.")
+            self.finished.emit(False, "Processing was cancelled.")
         except Exception as e:
             self.status.emit(f"Error: {str(e)}")
             self.finished.emit(False, f"Error: {str(e)}")
@@ -114,6 +153,17 @@ class MainWindow(QMainWindow):
         folder_layout.addWidget(self.browse_button)
         central_layout.addLayout(folder_layout)
 
+        # Parallel workers
+        workers_layout = QHBoxLayout()
+        workers_label = QLabel("Workers:")
+        self.workers_input = QSpinBox()
+        self.workers_input.setRange(1, os.cpu_count() or 1)
+        self.workers_input.setToolTip("Number of PDF files processed in parallel")
+        workers_layout.addWidget(workers_label)
+        workers_layout.addWidget(self.workers_input)
+        workers_layout.addStretch()
+        central_layout.addLayout(workers_layout)
+
         # Status display
         self.status_label = QLabel("Ready")
         central_layout.addWidget(self.status_label)
@@ -145,6 +195,10 @@ class MainWindow(QMainWindow):
         self.start_button.clicked.connect(self.on_start_clicked)
         self.start_button.setMinimumWidth(120)
         button_layout.addWidget(self.start_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.on_cancel_clicked)
+        self.cancel_button.setEnabled(False)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addStretch()
         central_layout.addLayout(button_layout)
 
@@ -157,7 +211,9 @@ class MainWindow(QMainWindow):
         if not icon.isNull():
             self.setWindowIcon(icon)
 
-        # Add status bar with version (right-aligned)
+        # Add status bar with throughput and version (right-aligned)
+        self.throughput_label = QLabel()
+        self.statusBar().addPermanentWidget(self.throughput_label)
         version_label = QLabel(f"v{__version__}")
         version_label.setAlignment(
             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
@@ -184,11 +240,12 @@ class MainWindow(QMainWindow):
             if reply == QMessageBox.No:
                 event.ignore()
                 return
-            # Signal worker to stop
+            # Signal worker to stop, it does so after the page or OCR call
+            # it is busy with
             if hasattr(self, "worker"):
-                self.worker.stop_requested = True
+                self.worker.stop()
             self.worker_thread.quit()
-            self.worker_thread.wait(2000)  # Wait max 2 seconds
+            self.worker_thread.wait(5000)  # Wait max 5 seconds
 
         self.save_settings()
         event.accept()
@@ -205,6 +262,7 @@ class MainWindow(QMainWindow):
         settings.setValue("pos", self.pos())
         settings.setValue("pos", self.pos())
         settings.setValue("folder_input", self.folder_input.text().strip())
+        settings.setValue("workers", self.workers_input.value())
         settings.endGroup()
 
     def load_settings(self):
@@ -218,6 +276,7 @@ class MainWindow(QMainWindow):
         self.resize(QSize(settings.value("size", self._default_size)))  # type: ignore
         self.move(QPoint(settings.value("pos", QPoint(200, 200))))  # type: ignore
         self.folder_input.setText(settings.value("folder_input", ""))
+        self.workers_input.setValue(int(settings.value("workers", 1)))  # type: ignore
         settings.endGroup()
 
     def pick_folder(self):
@@ -235,14 +294,31 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Error", "Please select a folder first.")
             return
 
+        resume = False
+        interrupted = find_interrupted_report(folder)
+        if interrupted is not None:
+            reply = QMessageBox.question(
+                self,
+                "Unfinished Report",
+                f"Processing of {interrupted.name} was interrupted. "
+                "Continue it instead of starting over?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.Yes,
+            )
+            resume = reply == QMessageBox.Yes
+
         # Disable button and create worker thread
         self.start_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
         self.progress_bar.setValue(0)
         self.status_label.setText("Starting processing...")
         self.results_display.clear()
+        self.throughput_label.clear()
 
         # Create worker and thread
-        self.worker = ProcessWorker(folder)
+        self.worker = ProcessWorker(
+            folder, workers=self.workers_input.value(), resume=resume
+        )
         self.worker_thread = QThread()
         self.worker.moveToThread(self.worker_thread)
 
@@ -250,14 +326,22 @@ class MainWindow(QMainWindow):
         self.worker_thread.started.connect(self.worker.run)
         self.worker.progress.connect(self.progress_bar.setValue)
         self.worker.status.connect(self.status_label.setText)
+        self.worker.throughput.connect(self.throughput_label.setText)
         self.worker.finished.connect(self.on_processing_finished)
 
         # Start the thread
         self.worker_thread.start()
 
+    def on_cancel_clicked(self):
+        """Handle the Cancel button click."""
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("Cancelling...")
+        self.worker.stop()
+
     def on_processing_finished(self, success: bool, message: str):
         """Handle processing completion."""
         self.start_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
 
         if success:
             logger.info(f"Successfully processed PDFs, result save at : {message}.")
@@ -0,0 +1,418 @@
+"""Watch a folder and process the PDFs dropped into it as they arrive.
+
+Every new PDF is processed once, when it has not changed for a while, and
+its records are appended to a daily watch_YYYY-MM-DD.csv report. A journal
+of the PDFs seen, by content, lets a restarted daemon carry on where it
+stopped without processing anything twice.
+
+Usage (from the project folder):
+
+    python watch.py path/to/scans --settle-seconds 10
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import signal
+import sys
+import threading
+import time
+from dataclasses import fields, replace
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable
+
+import red_pdf
+from cache import file_hash
+from ocr import limit_omp_threads
+from report import MANIFEST_SUFFIX, CheckpointedReport, manifest_path
+from results_db import ResultStore
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "watch_journal.jsonl"
+REPORT_PREFIX = "watch_"
+DEFAULT_SETTLE_SECONDS = 10.0
+DEFAULT_POLL_SECONDS = 30.0
+
+# inotify event masks, from <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+
+FileStat = tuple[int, int]  # size, mtime in ns
+
+
+class PollingWatcher:
+    """Lets the daemon sleep until the next scan of the folder."""
+
+    def wait(self, timeout: float, stop: threading.Event):
+        stop.wait(timeout)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(PollingWatcher):
+    """Wakes the daemon up as soon as a file is written to the folder.
+
+    Linux only. Files written by other machines to a network share raise no
+    events, so the folder is still scanned every `timeout`.
+    """
+
+    def __init__(self, folder: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def wait(self, timeout: float, stop: threading.Event):
+        deadline = time.monotonic() + timeout
+        while not stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # `stop` cannot be selected on, so it is checked every second.
+            ready, _, _ = select.select([self.fd], [], [], min(remaining, 1.0))
+            if ready:
+                self._drain()
+                return
+
+    def _drain(self):
+        # Which file changed does not matter, the folder is scanned again.
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(folder: Path, use_inotify: bool = True) -> PollingWatcher:
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify not available, polling {folder}: {e}")
+    return PollingWatcher()
+
+
+class WorkQueue:
+    """Journal of the PDFs seen in the folder, keyed by their content hash.
+
+    Each line is a state change: "queued" when processing starts, then
+    "done" or "failed". A PDF still "queued" after a crash or a stop is
+    processed again, skipping the pages already in the report.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.entries: dict[str, dict[str, Any]] = {}
+        needs_newline = False
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                text = f.read()
+            for line in text.splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring incomplete entry in {self.path.name}")
+                    continue
+                self.entries[entry["hash"]] = entry
+            needs_newline = bool(text) and not text.endswith("\n")
+        self._file = open(self.path, "a", encoding="utf-8")
+        if needs_newline:
+            # Keeps a line torn by a crash apart from the next entry.
+            self._file.write("\n")
+
+    def state(self, digest: str) -> str | None:
+        entry = self.entries.get(digest)
+        return None if entry is None else entry["state"]
+
+    def unfinished(self) -> list[dict[str, Any]]:
+        return [e for e in self.entries.values() if e["state"] == "queued"]
+
+    def mark(self, digest: str, pdf_name: str, state: str, **details: Any):
+        entry = {
+            "hash": digest,
+            "pdf": pdf_name,
+            "state": state,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            **details,
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.entries[digest] = entry
+
+    def close(self):
+        self._file.close()
+
+
+class RollingReport:
+    """Daily watch_YYYY-MM-DD.csv report in `folder`.
+
+    A report is completed when the day changes. The report left unfinished
+    by the last run is resumed first, so PDFs interrupted in it are
+    completed in the same report.
+    """
+
+    def __init__(self, folder: Path, fingerprint: str):
+        self.folder = folder
+        self.fingerprint = fingerprint
+        self.fieldnames = [f.name for f in fields(red_pdf.ResultRecord)]
+        self.day: date | None = None
+        self.report: CheckpointedReport | None = None
+
+        manifests = sorted(folder.glob(f"{REPORT_PREFIX}*.csv{MANIFEST_SUFFIX}"))
+        if manifests:
+            path = manifests[-1].with_name(
+                manifests[-1].name.removesuffix(MANIFEST_SUFFIX)
+            )
+            try:
+                self.report = CheckpointedReport.resume(
+                    path, self.fieldnames, fingerprint
+                )
+                self.day = date.fromisoformat(path.stem[len(REPORT_PREFIX) :][:10])
+            except (ValueError, FileNotFoundError) as e:
+                logger.warning(f"Not resuming {path.name}: {e}")
+
+    def current(self, roll: bool = True) -> CheckpointedReport:
+        """Report to write to, a new one if the day changed and `roll` is set."""
+        today = date.today()
+        if self.report is not None and (self.day == today or not roll):
+            return self.report
+        if self.report is not None:
+            self.report.close()
+            logger.info(f"Completed {self.report.path.name}")
+        self.report = self._create(today)
+        self.day = today
+        return self.report
+
+    def _create(self, day: date) -> CheckpointedReport:
+        path = self.folder / f"{REPORT_PREFIX}{day.isoformat()}.csv"
+        if path.exists() or manifest_path(path).exists():
+            # Written with other settings, or by an earlier run today.
+            path = path.with_stem(f"{path.stem}_{datetime.now():%H%M%S}")
+        logger.info(f"Writing records to {path}")
+        return CheckpointedReport.create(path, self.fieldnames, self.fingerprint)
+
+    def close(self):
+        # The manifest stays, the report is resumed on the next start.
+        if self.report is not None:
+            self.report.close(complete=False)
+
+
+def scan_folder(folder: Path) -> dict[str, FileStat]:
+    files = {}
+    for path in folder.glob("*.pdf"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files[path.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def watch_folder(
+    folder: str | Path,
+    options: red_pdf.ProcessOptions | None = None,
+    settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    report_dir: str | Path | None = None,
+    use_inotify: bool = True,
+    stop: threading.Event | None = None,
+    on_processed: Callable[[Path, int], None] | None = None,
+    db_path: str | Path | None = None,
+    overlays: bool = False,
+):
+    """Process the PDFs that appear in `folder` until `stop` is set.
+
+    A PDF is processed once its size and modification time have not changed
+    for `settle_seconds`, so files still being copied are left alone. The
+    report and the journal go to `report_dir`, `folder` by default.
+    `on_processed` is called with the path and record count of each PDF.
+    With a `db_path`, the records also go to that SQLite database. With
+    `overlays`, previews of the pages to review are saved next to the report,
+    see `red_pdf.write_overlay`.
+    """
+    folder = Path(folder)
+    report_dir = Path(report_dir or folder)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    options = options or red_pdf.ProcessOptions()
+    options = replace(
+        options, ocr_threads=red_pdf.resolve_ocr_threads(options.ocr_threads, 1)
+    )
+    limit_omp_threads(red_pdf.omp_thread_limit(1, options.ocr_threads))
+    stop = stop or threading.Event()
+
+    queue = WorkQueue(report_dir / JOURNAL_FILE)
+    fingerprint = red_pdf.processing_fingerprint(options)
+    reports = RollingReport(report_dir, fingerprint)
+    store = ResultStore(db_path) if db_path is not None else None
+
+    def process(path: Path, digest: str, roll: bool = True):
+        if queue.state(digest) != "queued":
+            queue.mark(digest, path.name, "queued")
+        report = reports.current(roll=roll)
+        stored_run = None
+        if store is not None:
+            stored_run = store.run(report.path, folder, fingerprint)
+        # Keyed by content, a changed PDF under the same name is new work.
+        key = f"{path.name}@{digest[:12]}"
+        pdf_options = options
+        if overlays:
+            overlay_dir = report.path.with_name(f"{report.path.stem}_overlays")
+            pdf_options = replace(options, overlay_dir=str(overlay_dir))
+        n_records = 0
+        logger.info(f"Processing {path.name}")
+        try:
+            for pagenum, result in red_pdf.iter_page_records(
+                path, pdf_options, skip_pages=report.pages_done(key)
+            ):
+                red_pdf.write_result(report, result, pagenum, key, stored_run)
+                n_records += len(result.records)
+                if stop.is_set():
+                    logger.info(f"Stopped in {path.name}, it is resumed on restart")
+                    return
+        except Exception as e:
+            logger.exception(f"Failed to process {path.name}")
+            queue.mark(digest, path.name, "failed", error=str(e))
+            return
+        queue.mark(digest, path.name, "done", report=report.path.name)
+        logger.info(f"Processed {path.name}: {n_records} records")
+        if on_processed is not None:
+            on_processed(path, n_records)
+
+    # Files waiting to settle, with their stat and when it was first seen,
+    # and the stat of the files already handled.
+    settling: dict[str, tuple[FileStat, float]] = {}
+    handled: dict[str, FileStat] = {}
+    watcher = make_watcher(folder, use_inotify)
+    logger.info(f"Watching {folder}")
+    try:
+        for entry in queue.unfinished():
+            path = folder / entry["pdf"]
+            if path.exists() and file_hash(path) == entry["hash"]:
+                process(path, entry["hash"], roll=False)
+            else:
+                queue.mark(entry["hash"], entry["pdf"], "failed", error="file changed")
+
+        while not stop.is_set():
+            now = time.monotonic()
+            files = scan_folder(folder)
+            for name in settling.keys() - files.keys():
+                del settling[name]
+            for name, stat in sorted(files.items()):
+                if stop.is_set():
+                    break
+                if handled.get(name) == stat:
+                    continue
+                previous = settling.get(name)
+                if previous is None or previous[0] != stat:
+                    settling[name] = (stat, now)
+                    continue
+                if now - previous[1] < settle_seconds:
+                    continue
+
+                try:
+                    digest = file_hash(folder / name)
+                except OSError as e:
+                    # Still locked by the scanner software, tried again later.
+                    logger.debug(f"{name} is not readable yet: {e}")
+                    continue
+                del settling[name]
+                handled[name] = stat
+                state = queue.state(digest)
+                if state in ("done", "failed"):
+                    logger.debug(f"{name} was already {state}")
+                    continue
+                process(folder / name, digest)
+
+            timeout = min(settle_seconds, poll_seconds) if settling else poll_seconds
+            watcher.wait(timeout, stop)
+    finally:
+        watcher.close()
+        reports.close()
+        queue.close()
+        if store is not None:
+            store.close()
+        logger.info(f"Stopped watching {folder}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", type=Path, help="folder the scanners save to")
+    red_pdf.add_option_arguments(parser)
+    parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=DEFAULT_SETTLE_SECONDS,
+        help="process a PDF once it has not changed for this long",
+    )
+    parser.add_argument(
+        "--poll-seconds",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help="scan the folder this often, inotify events wake it up sooner",
+    )
+    parser.add_argument(
+        "--report-dir",
+        type=Path,
+        help="folder for the daily reports and the journal, the watched one by "
+        "default",
+    )
+    parser.add_argument(
+        "--no-inotify", action="store_true", help="only poll the folder"
+    )
+    parser.add_argument(
+        "--db", help="also store the records in this SQLite database"
+    )
+    parser.add_argument(
+        "--overlays",
+        action="store_true",
+        help="save previews of the pages to review next to the report",
+    )
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    watch_folder(
+        args.folder,
+        options=red_pdf.options_from_args(args),
+        settle_seconds=args.settle_seconds,
+        poll_seconds=args.poll_seconds,
+        report_dir=args.report_dir,
+        use_inotify=not args.no_inotify,
+        stop=stop,
+        db_path=args.db,
+        overlays=args.overlays,
+    )
+
+
+if __name__ == "__main__":
+    from logging.handlers import RotatingFileHandler
+
+    logging.basicConfig(
+        handlers=[
+            RotatingFileHandler("watch.log", maxBytes=500_000, backupCount=3),
+            logging.StreamHandler(sys.stderr),
+        ],
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)8s - %(message)s",
+        encoding="utf-8",
+    )
+    logging.getLogger("pytesseract").setLevel(logging.WARNING)
+    main()